@@ -0,0 +1,247 @@
+# benchmark the ACAT pipeline stages on synthetic inventories
+#   python acat_bench.py --rows 1000 100000 --output bench.json
+#   python acat_bench.py --rows 10000000 --skip-train --compare bench_before.json
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from acat_data import headers, label_column, build_dataset, ordered_input_fn, read_inventory, sparse_input_fn, split_dataset
+from acat_encoder import FeatureEncoder
+from acat_numpy import NumpyMLP, export_weights
+
+# dense one-hot stages are skipped above this many cells (rows x width)
+MAX_DENSE_CELLS = 2 * 10 ** 8
+
+
+def synthetic_inventory(n_rows, seed=0, template='completeData.csv'):
+    """Generate n_rows with the completeData.csv schema.
+
+    Every column except id samples from the vocabulary and value
+    frequencies of the template file; id is unique per row, as in the
+    real exports. The output is deterministic for a given seed.
+    """
+    source = read_inventory(template)
+    rng = np.random.RandomState(seed)
+    columns = {}
+    for f in headers + [label_column]:
+        if f == 'id':
+            columns[f] = np.arange(1, n_rows + 1)
+            continue
+        counts = source[f].value_counts(sort=False)
+        codes = rng.choice(len(counts), size=n_rows, p=(counts / counts.sum()).values)
+        columns[f] = pd.Categorical.from_codes(codes, categories=counts.index)
+    return pd.DataFrame(columns, columns=headers + [label_column])
+
+
+def synthetic_csv(n_rows, seed, data_dir, template='completeData.csv'):
+    """Write (or reuse) the synthetic inventory for n_rows and return its path."""
+    path = os.path.join(data_dir, 'acat_synthetic_%d_%d.csv' % (n_rows, seed))
+    if not os.path.exists(path):
+        frame = synthetic_inventory(n_rows, seed=seed, template=template)
+        frame.to_csv(path + '.tmp')
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def legacy_csv_roundtrip(stack, workdir):
+    """The temp-file write and per-row re-parse acat.py used before the in-memory builder."""
+    train_path = os.path.join(workdir, 'acat_train.csv')
+    temp_path = os.path.join(workdir, 'train_temp.csv')
+    stack.to_csv(temp_path, index=False)
+    with open(train_path, 'w') as out, open(temp_path) as f:
+        out.write(str(stack.shape[0]) + ',' + str(stack.shape[1] - 1) + ',' + f.read())
+    with open(train_path) as f:
+        data_file = csv.reader(f)
+        header = next(data_file)
+        data = np.empty((int(header[0]), int(header[1])))
+        target = np.empty((int(header[0]),), dtype=np.int64)
+        for i, ir in enumerate(data_file):
+            target[i] = int(eval(ir.pop(0)))
+            data[i] = np.asarray(ir, dtype=np.float64)
+    return data, target
+
+
+class StageTimer(object):
+    """Time named stages, repeating each one, then measure each one's peak memory in a separate pass."""
+
+    def __init__(self, rows, repeat):
+        self.rows = rows
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, stage, fn, repeat=None, memory=True):
+        # timed runs have tracemalloc off (it slows every allocation); the peak
+        # comes from one extra traced run whose time is not reported. Stages
+        # with side effects (training continues from its last step) pass memory=False.
+        times = []
+        for _ in range(repeat or self.repeat):
+            result = None
+            gc.collect()
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        peak = None
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                fn()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        self.results.append({'rows': self.rows, 'stage': stage, 'status': 'ok',
+                             'seconds': times, 'seconds_min': min(times),
+                             'seconds_median': float(np.median(times)), 'peak_bytes': peak})
+        memory = '%8.1f MiB' % (peak / 2.0 ** 20) if peak is not None else '%12s' % '-'
+        print("%10d rows  %-22s %10.4fs  %s" % (self.rows, stage, min(times), memory), file=sys.stderr)
+        return result
+
+    def skip(self, stage, reason):
+        self.results.append({'rows': self.rows, 'stage': stage, 'status': 'skipped: ' + reason})
+        print("%10d rows  %-22s skipped (%s)" % (self.rows, stage, reason), file=sys.stderr)
+
+
+def bench_rows(n_rows, args, workdir):
+    """Run every pipeline stage once per repeat on a synthetic inventory of n_rows."""
+    timer = StageTimer(n_rows, args.repeat)
+    path = synthetic_csv(n_rows, args.seed, args.data_dir, template=args.template)
+
+    ds = timer.run('csv_load', lambda: read_inventory(path))
+    labels = ds.pop(label_column)
+    df_num, df_labels = pd.factorize(labels)
+
+    def categorise():
+        frame = ds.copy()
+        for f in headers:
+            frame[f] = frame[f].astype('category')
+        return frame
+    categorised = timer.run('categorise', categorise)
+
+    encoder = timer.run('encoder_fit', lambda: FeatureEncoder.fit(ds, labels=df_labels))
+    indices = timer.run('encode_indices', lambda: encoder.transform_indices(ds))
+    dataset = timer.run('build_dataset', lambda: build_dataset(indices, df_num, dtype=np.int32))
+    training_set, test_set = split_dataset(dataset, test_size=0.25, random_state=args.seed)
+
+    dense_ok = n_rows * encoder.width <= args.max_dense_cells
+    reason = '%d x %d one-hot cells' % (n_rows, encoder.width)
+    if dense_ok:
+        dummies = timer.run('get_dummies', lambda: pd.get_dummies(categorised, columns=headers))
+        timer.run('encode_dense', lambda: encoder.transform(ds))
+        stack = pd.DataFrame(np.column_stack((df_num, dummies)))
+        timer.run('legacy_csv_roundtrip', lambda: legacy_csv_roundtrip(stack, workdir), repeat=1)
+        del dummies, stack
+    else:
+        for stage in ('get_dummies', 'encode_dense', 'legacy_csv_roundtrip'):
+            timer.skip(stage, reason)
+    del categorised
+
+    mlp = None
+    if args.skip_train:
+        for stage in ('train', 'evaluate', 'predict_tf'):
+            timer.skip(stage, '--skip-train')
+    else:
+        mlp = bench_tensorflow(timer, encoder, df_labels, training_set, test_set, args, workdir)
+    if mlp is None:
+        # prediction cost does not depend on the weight values
+        rng = np.random.RandomState(args.seed)
+        sizes = [encoder.width, 10, 20, 10, len(df_labels)]
+        mlp = NumpyMLP([rng.randn(a, b) for a, b in zip(sizes[:-1], sizes[1:])],
+                       [rng.randn(b) for b in sizes[1:]])
+    timer.run('predict_numpy', lambda: mlp.predict_indices(indices))
+    return timer.results
+
+
+def bench_tensorflow(timer, encoder, df_labels, training_set, test_set, args, workdir):
+    """Time fit/evaluate/predict of the DNNClassifier; returns its NumpyMLP export."""
+    try:
+        import tensorflow as tf
+    except ImportError:
+        for stage in ('train', 'evaluate', 'predict_tf'):
+            timer.skip(stage, 'tensorflow not installed')
+        return None
+
+    tf.logging.set_verbosity(tf.logging.ERROR)
+    model_dir = tempfile.mkdtemp(prefix='model_', dir=workdir)
+    feature_columns = [tf.contrib.layers.real_valued_column("", dimension=encoder.width)]
+    classifier = tf.contrib.learn.DNNClassifier(feature_columns=feature_columns, hidden_units=[10, 20, 10],
+                                                n_classes=len(df_labels), model_dir=model_dir,
+                                                config=tf.contrib.learn.RunConfig(tf_random_seed=args.seed))
+    timer.run('train', lambda: classifier.fit(input_fn=sparse_input_fn(training_set, encoder.width),
+                                              steps=args.train_steps), repeat=1, memory=False)
+    full_pass = ordered_input_fn(test_set, encoder.width)
+    timer.run('evaluate', lambda: classifier.evaluate(input_fn=full_pass))
+    timer.run('predict_tf', lambda: list(classifier.predict(input_fn=full_pass)))
+    weights = os.path.join(workdir, 'weights.npz')
+    export_weights(classifier, weights)
+    return NumpyMLP.load(weights)
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'pandas': pd.__version__,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def compare(results, baseline_path):
+    """Print the min-time ratio of every stage against a previous run."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = dict(((r['rows'], r['stage']), r) for r in baseline['results'] if 'seconds_min' in r)
+    print("\n%10s  %-22s %10s %10s %8s" % ('rows', 'stage', 'before', 'after', 'ratio'))
+    for r in results:
+        old = before.get((r['rows'], r['stage']))
+        if old is None or 'seconds_min' not in r:
+            continue
+        print("%10d  %-22s %9.4fs %9.4fs %7.2fx" % (r['rows'], r['stage'], old['seconds_min'],
+                                                     r['seconds_min'], old['seconds_min'] / r['seconds_min']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the ACAT pipeline stages.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000],
+                        help='synthetic dataset sizes (e.g. 1000 100000 10000000)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--template', default='completeData.csv', help='file whose schema and vocabularies are sampled')
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(), help='where generated inventories are cached')
+    parser.add_argument('--train-steps', type=int, default=2000)
+    parser.add_argument('--skip-train', action='store_true', help='skip the TensorFlow stages')
+    parser.add_argument('--max-dense-cells', type=int, default=MAX_DENSE_CELLS)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help='earlier results file to compare against')
+    args = parser.parse_args(argv)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='acat_bench_')
+    try:
+        for n_rows in args.rows:
+            results.extend(bench_rows(n_rows, args, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'args': vars(args), 'results': results}, f, indent=2)
+    print("results written to %s" % args.output)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# shared dataset helpers for the ACAT classifier
+import collections
+
+import numpy as np
+import pandas as pd
+
+headers = ['business_classification', 'business_impact', 'business_relevance',
+       'category_id', 'data_confidentiality', 'eoldriver', 'extensibility',
+       'geographical_scope', 'has_dependencies', 'id', 'io_intensity',
+       'latency_sensitivity', 'no_of_users', 'scalability', 'service_level',
+       'source_code_available', 'stage', 'type', 'user_facing',
+       'workload_variation', 'dependencies.Hardware.Dependent',
+       'dependencies.Operating.Environment.Dependent',
+       'dependencies.Operating.System.Dependent', 'IsPassPlatAvail',
+       'IsHarwareSupported', 'IsOSSupported', 'IsPlatformSupported',
+       'IsDatabaseSupported']
+
+label_column = 'pivot.disposition_1'
+
+Dataset = collections.namedtuple('Dataset', ['data', 'target'])
+Datasets = collections.namedtuple('Datasets', ['train', 'validation', 'test'])
+
+
+def read_inventory(filename, with_labels=True):
+    """Read the feature columns (and the disposition label) in a single pass."""
+    usecols = headers + [label_column] if with_labels else headers
+    return pd.read_csv(filename, usecols=usecols)
+
+
+def build_dataset(features, target, dtype=np.float32, target_dtype=np.int32):
+    """Build a Dataset from encoded features and factorized labels in memory.
+
+    Replaces the old write-temp-csv / load_csv round trip: the features
+    are copied once into a contiguous block (float32 one-hot rows, or
+    int32 index lists from FeatureEncoder.transform_indices) and the
+    labels into a contiguous integer vector.
+    """
+    data = np.ascontiguousarray(np.asarray(features, dtype=dtype))
+    target = np.ascontiguousarray(np.asarray(target, dtype=target_dtype))
+    if data.shape[0] != target.shape[0]:
+        raise ValueError('features and target have different lengths: %d != %d'
+                         % (data.shape[0], target.shape[0]))
+    return Dataset(data=data, target=target)
+
+
+def split_dataset(dataset, test_size=0.25, random_state=None):
+    """Shuffle and split a Dataset into (train, test) without copying through pandas."""
+    n_samples = dataset.target.shape[0]
+    n_test = int(np.ceil(test_size * n_samples))
+    order = np.random.RandomState(random_state).permutation(n_samples)
+    test_idx, train_idx = order[:n_test], order[n_test:]
+    train = Dataset(data=dataset.data[train_idx], target=dataset.target[train_idx])
+    test = Dataset(data=dataset.data[test_idx], target=dataset.target[test_idx])
+    return train, test
+
+
+# rows per training, evaluation and prediction step
+DEFAULT_BATCH_SIZE = 256
+
+
+def one_hot_rows(indices, width):
+    """Densify an (n, k) int index tensor into (n, width) one-hot rows via a SparseTensor.
+
+    Index -1 (unseen category) is dropped, so its block stays all-zero.
+    Only the n * width output is materialised, never an (n, k, width) one-hot.
+    """
+    import tensorflow as tf
+
+    present = tf.greater_equal(indices, 0)
+    positions = tf.where(present)
+    columns = tf.cast(tf.boolean_mask(indices, present), tf.int64)
+    sparse = tf.SparseTensor(indices=tf.stack([positions[:, 0], columns], axis=1),
+                             values=tf.ones_like(columns, dtype=tf.float32),
+                             dense_shape=tf.stack([tf.shape(indices, out_type=tf.int64)[0],
+                                                   tf.constant(width, dtype=tf.int64)]))
+    return tf.sparse_tensor_to_dense(tf.sparse_reorder(sparse))
+
+
+def sparse_input_fn(dataset, width, batch_size=DEFAULT_BATCH_SIZE):
+    """Estimator input_fn for a Dataset of one-hot index lists.
+
+    Only the (n, len(headers)) index matrix is held as a graph constant;
+    each shuffled mini-batch of batch_size rows is expanded to its one-hot
+    rows inside the graph (see one_hot_rows). The feature is keyed "" to
+    match real_valued_column("", dimension=width), whose DNNClassifier
+    layout the registry and NumpyMLP rely on.
+    """
+    def input_fn():
+        import tensorflow as tf
+
+        indices = tf.constant(dataset.data)
+        target = tf.constant(dataset.target) if dataset.target is not None else None
+        tensors = [indices] if target is None else [indices, target]
+        batch = tf.train.shuffle_batch(tensors, batch_size=batch_size, capacity=10 * batch_size,
+                                       min_after_dequeue=2 * batch_size, enqueue_many=True)
+        return {"": one_hot_rows(batch[0], width)}, batch[1] if target is not None else None
+    return input_fn
+
+
+def ordered_input_fn(dataset, width, batch_size=DEFAULT_BATCH_SIZE):
+    """Like sparse_input_fn, but one pass over the Dataset in input order.
+
+    Batches of batch_size rows (the last one smaller) are densified one at
+    a time, so evaluating or predicting a large test set never builds a
+    single (n, width) tensor. The input ends after one epoch: use
+    evaluate(steps=None) and predict(as_iterable=True) with it.
+    """
+    def input_fn():
+        import tensorflow as tf
+
+        tensors = [tf.constant(dataset.data)]
+        if dataset.target is not None:
+            tensors.append(tf.constant(dataset.target))
+        # a single enqueue thread keeps the rows in order
+        batch = tf.train.batch([tf.train.limit_epochs(t, num_epochs=1) for t in tensors],
+                               batch_size=batch_size, num_threads=1, capacity=4 * batch_size,
+                               enqueue_many=True, allow_smaller_final_batch=True)
+        return {"": one_hot_rows(batch[0], width)}, batch[1] if dataset.target is not None else None
+    return input_fn
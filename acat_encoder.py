@@ -0,0 +1,112 @@
+# fitted one-hot encoder for the ACAT inventory columns
+import numpy as np
+import pandas as pd
+
+from acat_data import headers
+
+FORMAT_VERSION = 1
+
+
+def _storable(values):
+    """Return values as an array np.savez can write without pickling."""
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    return values
+
+
+def densify(indices, width):
+    """Expand (n, k) active-column indices (-1 = none) into a dense (n, width) float32 matrix."""
+    indices = np.asarray(indices)
+    data = np.zeros((indices.shape[0], width), dtype=np.float32)
+    rows, cols = np.nonzero(indices >= 0)
+    data[rows, indices[rows, cols]] = 1.0
+    return data
+
+
+class FeatureEncoder(object):
+    """Category vocabularies plus the one-hot layout they imply.
+
+    Column j of the inventory owns the block
+    [offsets[j], offsets[j] + len(vocabularies[j])) of the encoded vector,
+    in the same order pd.get_dummies(ds, columns=headers) produces. Values
+    that were not seen at fit time encode to an all-zero block.
+    """
+
+    def __init__(self, columns, vocabularies, labels=None):
+        if len(columns) != len(vocabularies):
+            raise ValueError('got %d columns but %d vocabularies'
+                             % (len(columns), len(vocabularies)))
+        self.columns = list(columns)
+        self.vocabularies = [_storable(v) for v in vocabularies]
+        self.labels = None if labels is None else _storable(labels)
+        sizes = np.array([len(v) for v in self.vocabularies], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int32)
+        self.width = int(sizes.sum())
+        # hash tables are built once here and reused by every transform call
+        self._lookups = [pd.Index(v) for v in self.vocabularies]
+
+    @classmethod
+    def fit(cls, frame, labels=None, columns=headers):
+        """Learn the vocabulary of every column from a raw inventory frame."""
+        vocabularies = [frame[f].astype('category').cat.categories.values for f in columns]
+        return cls(columns, vocabularies, labels=labels)
+
+    def feature_names(self):
+        """Column names matching pd.get_dummies(prefix_sep='_')."""
+        return ['%s_%s' % (f, v) for f, vocab in zip(self.columns, self.vocabularies) for v in vocab]
+
+    def codes(self, frame):
+        """Per-column category codes as an (n, len(columns)) int32 array, -1 if unseen."""
+        missing = [f for f in self.columns if f not in frame]
+        if missing:
+            raise KeyError('input is missing columns: %s' % ', '.join(missing))
+        out = np.empty((len(frame), len(self.columns)), dtype=np.int32)
+        for j, f in enumerate(self.columns):
+            out[:, j] = self._lookups[j].get_indexer(np.asarray(frame[f]))
+        return out
+
+    def transform_indices(self, frame):
+        """Encode a raw frame as one-hot index lists.
+
+        Returns an (n, len(columns)) int32 array holding the active column of
+        every row in each block, or -1 where the value was unseen. This is
+        the sparse form of transform(): memory grows with rows x columns,
+        not rows x width.
+        """
+        codes = self.codes(frame)
+        return np.where(codes >= 0, codes + self.offsets, -1).astype(np.int32)
+
+    def transform(self, frame):
+        """Encode a raw frame into a dense (n, width) float32 one-hot matrix."""
+        return densify(self.transform_indices(frame), self.width)
+
+    def encode_labels(self, labels):
+        """Map disposition strings to class indices, -1 if unknown."""
+        return pd.Index(self.labels).get_indexer(np.asarray(labels)).astype(np.int32)
+
+    def decode_labels(self, indices):
+        """Map class indices back to disposition strings."""
+        return self.labels[np.asarray(indices, dtype=np.int64)]
+
+    def save(self, path):
+        """Write the encoder to a compressed .npz file."""
+        arrays = {'format_version': np.array(FORMAT_VERSION),
+                  'columns': np.array(self.columns)}
+        if self.labels is not None:
+            arrays['labels'] = self.labels
+        for j, vocab in enumerate(self.vocabularies):
+            arrays['vocab_%d' % j] = vocab
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read an encoder written by save()."""
+        with np.load(path, allow_pickle=False) as npz:
+            version = int(npz['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError('unsupported encoder format version %d in %s' % (version, path))
+            columns = [str(c) for c in npz['columns']]
+            vocabularies = [npz['vocab_%d' % j] for j in range(len(columns))]
+            labels = npz['labels'] if 'labels' in npz.files else None
+        return cls(columns, vocabularies, labels=labels)
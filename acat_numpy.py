@@ -0,0 +1,123 @@
+# TensorFlow-free inference for the trained ACAT DNNClassifier
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# dnn/hiddenlayer_0/weights, dnn/logits/biases, dnn/hiddenlayer_1/kernel/part_0, ...
+_VARIABLE_RE = re.compile(r'^dnn/(?:hiddenlayer_(\d+)|(logits))/(weights|kernel|biases|bias)(?:/part_(\d+))?$')
+
+
+def weight_arrays(classifier):
+    """Return the dense layer weights of a trained DNNClassifier as a dict.
+
+    The keys are W0, b0, ..., Wk, bk in layer order, the last pair being
+    the logits layer. Partitioned variables are concatenated back together.
+    """
+    parts = defaultdict(list)
+    for name in classifier.get_variable_names():
+        match = _VARIABLE_RE.match(name)
+        if not match:
+            continue
+        hidden, logits, kind, part = match.groups()
+        layer = float('inf') if logits else int(hidden)
+        kind = 'W' if kind in ('weights', 'kernel') else 'b'
+        parts[layer, kind].append((int(part or 0), classifier.get_variable_value(name)))
+    layers = sorted(set(layer for layer, _ in parts))
+    if not layers or layers[-1] != float('inf'):
+        raise ValueError('no dnn/logits variables found in classifier')
+    arrays = {}
+    for i, layer in enumerate(layers):
+        for kind in ('W', 'b'):
+            values = [value for _, value in sorted(parts[layer, kind], key=lambda p: p[0])]
+            arrays['%s%d' % (kind, i)] = np.concatenate(values, axis=0).astype(np.float32)
+    return arrays
+
+
+def export_weights(classifier, path):
+    """Copy the weight_arrays() of a trained DNNClassifier into a .npz file."""
+    np.savez(path, **weight_arrays(classifier))
+
+
+class NumpyMLP(object):
+    """ReLU multilayer perceptron evaluated with plain NumPy matmuls."""
+
+    def __init__(self, weights, biases):
+        if len(weights) != len(biases):
+            raise ValueError('got %d weight matrices but %d bias vectors' % (len(weights), len(biases)))
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self._padded = None
+
+    @classmethod
+    def load(cls, path):
+        """Read weights written by export_weights()."""
+        with np.load(path, allow_pickle=False) as npz:
+            n_layers = len([k for k in npz.files if k.startswith('W')])
+            weights = [npz['W%d' % i] for i in range(n_layers)]
+            biases = [npz['b%d' % i] for i in range(n_layers)]
+        return cls(weights, biases)
+
+    @property
+    def width(self):
+        return self.weights[0].shape[0]
+
+    def _forward(self, h):
+        """Apply the layers after the first to the first layer's pre-activation."""
+        for w, b in zip(self.weights[1:], self.biases[1:]):
+            h = np.dot(np.maximum(h, 0.0), w) + b
+        return h
+
+    def logits(self, data):
+        """Return the pre-softmax outputs for an (n, width) array."""
+        h = np.dot(np.asarray(data, dtype=np.float32), self.weights[0]) + self.biases[0]
+        return self._forward(h)
+
+    def logits_indices(self, indices):
+        """Return the pre-softmax outputs for one-hot index lists.
+
+        The first layer of a one-hot input is a sum of weight rows, so it is
+        computed as an embedding lookup: one gather per input column instead
+        of an (n, width) matmul. Index -1 selects an appended zero row.
+        """
+        if self._padded is None:
+            self._padded = np.vstack((self.weights[0], np.zeros((1, self.weights[0].shape[1]), np.float32)))
+        indices = np.asarray(indices)
+        h = np.empty((indices.shape[0], self._padded.shape[1]), dtype=np.float32)
+        h[:] = self.biases[0]
+        for j in range(indices.shape[1]):
+            h += self._padded[indices[:, j]]
+        return self._forward(h)
+
+    def predict_proba(self, data):
+        """Class probabilities, as DNNClassifier.predict_proba returns them."""
+        return self._proba(self.logits(data))
+
+    def predict_proba_indices(self, indices):
+        """predict_proba() for one-hot index lists."""
+        return self._proba(self.logits_indices(indices))
+
+    def predict(self, data):
+        """Class indices into the encoder labels, as DNNClassifier.predict returns them."""
+        return self._classes(self.logits(data))
+
+    def predict_indices(self, indices):
+        """predict() for one-hot index lists."""
+        return self._classes(self.logits_indices(indices))
+
+    @staticmethod
+    def _proba(z):
+        if z.shape[1] == 1:
+            # two-class heads have a single logistic output
+            p = 1.0 / (1.0 + np.exp(-z))
+            return np.hstack((1.0 - p, p))
+        z = z - z.max(axis=1, keepdims=True)
+        np.exp(z, out=z)
+        z /= z.sum(axis=1, keepdims=True)
+        return z
+
+    @staticmethod
+    def _classes(z):
+        if z.shape[1] == 1:
+            return (z[:, 0] > 0).astype(np.int64)
+        return z.argmax(axis=1).astype(np.int64)
@@ -0,0 +1,189 @@
+# versioned on-disk registry of trained ACAT models
+#
+#   <root>/LATEST            name of the newest complete version
+#   <root>/v0001/model/      DNNClassifier checkpoints
+#   <root>/v0001/encoder.npz FeatureEncoder (vocabularies, layout, labels)
+#   <root>/v0001/weights.npz dense layer weights for acat_numpy.NumpyMLP
+#   <root>/v0001/meta.json   hidden_units, n_classes, steps, accuracy, parent, ...
+#
+# TensorFlow is only imported by build_classifier, so loaders that do not
+# need the graph (the service, batch scoring) stay light.
+import datetime
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from acat_encoder import FeatureEncoder, densify
+from acat_numpy import NumpyMLP, weight_arrays
+
+_VERSION_RE = re.compile(r'^v(\d+)$')
+
+
+def version_name(version):
+    """Normalise 3, '3' or 'v3' to the directory name 'v0003'."""
+    match = _VERSION_RE.match(str(version))
+    number = int(match.group(1)) if match else int(version)
+    return 'v%04d' % number
+
+
+def list_versions(root):
+    """Return the complete version names under root, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    names = [name for name in os.listdir(root)
+             if _VERSION_RE.match(name) and os.path.exists(os.path.join(root, name, 'meta.json'))]
+    return sorted(names, key=lambda name: int(name[1:]))
+
+
+def latest_version(root):
+    """Return the version named in LATEST, or None for an empty registry."""
+    try:
+        with open(os.path.join(root, 'LATEST')) as f:
+            return f.read().strip() or None
+    except IOError:
+        versions = list_versions(root)
+        return versions[-1] if versions else None
+
+
+def _relocatable_checkpoints(model_dir):
+    """Rewrite the checkpoint state file to use bare file names.
+
+    TensorFlow resolves relative checkpoint paths against the model
+    directory, so a version can then be copied or moved as a whole.
+    """
+    state = os.path.join(model_dir, 'checkpoint')
+    if not os.path.exists(state):
+        return
+    with open(state) as f:
+        text = f.read()
+    text = re.sub(r'"([^"]*)"', lambda m: '"%s"' % os.path.basename(m.group(1).replace('\\', '/')), text)
+    with open(state, 'w') as f:
+        f.write(text)
+
+
+def create_version(root, parent=None):
+    """Reserve the next version directory and return its path.
+
+    With a parent version the parent's checkpoints are copied into the new
+    model directory, so fitting the new classifier continues from the
+    parent's weights instead of a random initialisation.
+    """
+    versions = [int(name[1:]) for name in os.listdir(root) if _VERSION_RE.match(name)] \
+        if os.path.isdir(root) else []
+    number = max(versions) + 1 if versions else 1
+    while True:
+        path = os.path.join(root, version_name(number))
+        try:
+            os.makedirs(path)
+            break
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            number += 1  # someone else took this number
+    model_dir = os.path.join(path, 'model')
+    if parent is None:
+        os.makedirs(model_dir)
+    else:
+        shutil.copytree(os.path.join(root, version_name(parent), 'model'), model_dir,
+                        ignore=shutil.ignore_patterns('events.out.tfevents.*'))
+        _relocatable_checkpoints(model_dir)
+    return path
+
+
+def _checked_weights(classifier, encoder):
+    """Return the classifier's weight arrays, rejecting a model the encoder cannot feed."""
+    arrays = weight_arrays(classifier)
+    if arrays['W0'].shape[0] != encoder.width:
+        raise ValueError('classifier expects %d input features but the encoder produces %d; '
+                         'train it on encoder.transform() output before publishing'
+                         % (arrays['W0'].shape[0], encoder.width))
+    return arrays
+
+
+def save_version(path, encoder, meta, classifier=None):
+    """Write the encoder and metadata of a trained version and publish it.
+
+    Passing the trained classifier also exports weights.npz for
+    TensorFlow-free inference.
+    """
+    root, name = os.path.split(os.path.normpath(path))
+    _relocatable_checkpoints(os.path.join(path, 'model'))
+    if classifier is not None:
+        np.savez(os.path.join(path, 'weights.npz'), **_checked_weights(classifier, encoder))
+    encoder.save(os.path.join(path, 'encoder.npz'))
+    meta = dict(meta, version=name, created=datetime.datetime.utcnow().isoformat() + 'Z')
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    # publish last, via rename, so readers never see a half-written version
+    latest = os.path.join(root, 'LATEST')
+    with open(latest + '.tmp', 'w') as f:
+        f.write(name + '\n')
+    os.replace(latest + '.tmp', latest)
+    return meta
+
+
+def publish_checkpoints(root, model_dir, encoder, meta, classifier=None):
+    """Publish a classifier trained outside the registry (e.g. in a notebook)."""
+    if classifier is not None:
+        _checked_weights(classifier, encoder)  # fail before reserving a version
+    path = create_version(root)
+    model_path = os.path.join(path, 'model')
+    os.rmdir(model_path)
+    shutil.copytree(model_dir, model_path, ignore=shutil.ignore_patterns('events.out.tfevents.*'))
+    return save_version(path, encoder, meta, classifier=classifier)
+
+
+def load_version(root, version=None):
+    """Return (path, meta, encoder) for a version, the latest by default."""
+    name = version_name(version) if version is not None else latest_version(root)
+    if name is None:
+        raise IOError('no trained model versions in %s' % root)
+    path = os.path.join(root, name)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    encoder = FeatureEncoder.load(os.path.join(path, 'encoder.npz'))
+    return path, meta, encoder
+
+
+def build_classifier(path, meta, encoder):
+    """Rebuild the DNNClassifier for a version directory."""
+    import tensorflow as tf
+
+    feature_columns = [tf.contrib.layers.real_valued_column("", dimension=encoder.width)]
+    return tf.contrib.learn.DNNClassifier(feature_columns=feature_columns, hidden_units=meta['hidden_units'],
+                                          n_classes=meta['n_classes'], model_dir=os.path.join(path, 'model'))
+
+
+class _EstimatorModel(object):
+    """NumpyMLP-compatible wrapper around a DNNClassifier."""
+
+    def __init__(self, classifier, width):
+        self.classifier = classifier
+        self.width = width
+
+    def predict(self, data):
+        return np.fromiter(self.classifier.predict(x=data, as_iterable=True), dtype=np.int64, count=len(data))
+
+    def predict_proba(self, data):
+        return np.array(list(self.classifier.predict_proba(x=data, as_iterable=True)), dtype=np.float32)
+
+    def predict_indices(self, indices):
+        return self.predict(densify(indices, self.width))
+
+    def predict_proba_indices(self, indices):
+        return self.predict_proba(densify(indices, self.width))
+
+
+def load_model(path, meta, encoder):
+    """Return a model with predict/predict_proba for a version directory.
+
+    Uses the exported NumPy weights when the version has them and only
+    falls back to TensorFlow for versions published without weights.npz.
+    """
+    weights = os.path.join(path, 'weights.npz')
+    if os.path.exists(weights):
+        return NumpyMLP.load(weights)
+    return _EstimatorModel(build_classifier(path, meta, encoder), encoder.width)
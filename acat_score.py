@@ -0,0 +1,95 @@
+# score large inventory exports in fixed-size chunks
+#   python acat_score.py topredict.csv predictions.csv
+#   python acat_score.py big_export.csv predictions.csv --proba --resume
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+import acat_registry
+from acat_data import headers
+
+
+def scored_rows(path):
+    """Count the complete rows already in an output file, excluding the header.
+
+    A partial last line left by an interrupted run is cut off so the file
+    can be appended to.
+    """
+    if not os.path.exists(path):
+        return 0
+    lines = 0
+    last_newline = -1
+    with open(path, 'rb') as f:
+        offset = 0
+        for block in iter(lambda: f.read(1 << 20), b''):
+            count = block.count(b'\n')
+            if count:
+                lines += count
+                last_newline = offset + block.rindex(b'\n')
+            offset += len(block)
+    if last_newline + 1 != offset:
+        with open(path, 'r+b') as f:
+            f.truncate(last_newline + 1)
+    return max(lines - 1, 0)
+
+
+def score_csv(model, encoder, src, dst, chunk_size=100000, start=0, with_proba=False):
+    """Stream src through the model and write id, disposition (and probabilities) to dst.
+
+    Only one chunk of chunk_size rows is held in memory at a time. With
+    start > 0 the first start data rows of src are skipped and results are
+    appended to dst. Yields the total number of rows written after each chunk.
+    """
+    # a callable keeps the skip O(1) in memory; a range would become a set of start row numbers
+    reader = pd.read_csv(src, usecols=headers, chunksize=chunk_size,
+                         skiprows=(lambda i: 0 < i <= start) if start else None)
+    labels = [str(l) for l in encoder.labels]
+    columns = ['id', 'disposition'] + (['p_%s' % l for l in labels] if with_proba else [])
+    total = start
+    with open(dst, 'a' if start else 'w', newline='') as out:
+        if out.tell() == 0:
+            out.write(','.join(columns) + '\n')
+        for chunk in reader:
+            data = encoder.transform_indices(chunk)
+            result = pd.DataFrame({'id': chunk['id'].values})
+            if with_proba:
+                proba = model.predict_proba_indices(data)
+                result['disposition'] = encoder.decode_labels(proba.argmax(axis=1))
+                for j, column in enumerate(columns[2:]):
+                    result[column] = proba[:, j]
+            else:
+                result['disposition'] = encoder.decode_labels(model.predict_indices(data))
+            result.to_csv(out, header=False, index=False, float_format='%.6f')
+            out.flush()
+            total += len(chunk)
+            yield total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score an inventory CSV with a trained ACAT model.')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--registry', default='models', help='model registry directory')
+    parser.add_argument('--version', default=None, help='model version (default: latest)')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--proba', action='store_true', help='also write class probabilities')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--resume', action='store_true',
+                       help='continue after the rows already present in the output file')
+    group.add_argument('--start', type=int, default=0, help='skip this many input rows')
+    args = parser.parse_args(argv)
+
+    path, meta, encoder = acat_registry.load_version(args.registry, args.version)
+    model = acat_registry.load_model(path, meta, encoder)
+    start = scored_rows(args.output) if args.resume else args.start
+    if start:
+        print("resuming %s at row %d" % (args.input, start), file=sys.stderr)
+    for total in score_csv(model, encoder, args.input, args.output, chunk_size=args.chunk_size,
+                           start=start, with_proba=args.proba):
+        print("scored %d rows with model %s" % (total, meta['version']), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
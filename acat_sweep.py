@@ -0,0 +1,127 @@
+# k-fold cross-validation and hyperparameter sweep for the ACAT classifier
+#   python acat_sweep.py --hidden-units 10,20,10 --hidden-units 32,16 \
+#       --steps 500 2000 --learning-rate 0.05 0.1 --folds 5 --workers 8
+import argparse
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from acat_data import Dataset, label_column, ordered_input_fn, read_inventory, sparse_input_fn
+from acat_encoder import FeatureEncoder
+
+# set in each worker by _init_worker; memory-mapped, so every process shares
+# the page cache copy of the encoded dataset instead of holding its own
+_shared = {}
+
+
+def _init_worker(data_path, target_path, width):
+    _shared['data'] = np.load(data_path, mmap_mode='r')
+    _shared['target'] = np.load(target_path, mmap_mode='r')
+    _shared['width'] = width
+
+
+def fold_indices(n_samples, folds, seed):
+    """Split a seeded permutation of range(n_samples) into k (train, test) index pairs."""
+    order = np.random.RandomState(seed).permutation(n_samples)
+    parts = np.array_split(order, folds)
+    return [(np.sort(np.concatenate(parts[:k] + parts[k + 1:])), np.sort(parts[k])) for k in range(folds)]
+
+
+def run_fold(task):
+    """Train and evaluate one configuration on one fold (runs in a worker process)."""
+    import tensorflow as tf
+
+    tf.logging.set_verbosity(tf.logging.ERROR)
+    data, target, width = _shared['data'], _shared['target'], _shared['width']
+    train_idx, test_idx = task['train'], task['test']
+    training_set = Dataset(data=np.asarray(data[train_idx]), target=np.asarray(target[train_idx]))
+    test_set = Dataset(data=np.asarray(data[test_idx]), target=np.asarray(target[test_idx]))
+
+    model_dir = tempfile.mkdtemp(prefix='acat_sweep_')
+    try:
+        feature_columns = [tf.contrib.layers.real_valued_column("", dimension=width)]
+        classifier = tf.contrib.learn.DNNClassifier(
+            feature_columns=feature_columns, hidden_units=list(task['hidden_units']),
+            n_classes=task['n_classes'], model_dir=model_dir,
+            optimizer=tf.train.AdagradOptimizer(learning_rate=task['learning_rate']),
+            config=tf.contrib.learn.RunConfig(tf_random_seed=task['seed']))
+        start = time.time()
+        classifier.fit(input_fn=sparse_input_fn(training_set, width), steps=task['steps'])
+        seconds = time.time() - start
+        accuracy = classifier.evaluate(input_fn=ordered_input_fn(test_set, width))['accuracy']
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+    return {'hidden_units': '-'.join(str(u) for u in task['hidden_units']), 'steps': task['steps'],
+            'learning_rate': task['learning_rate'], 'fold': task['fold'],
+            'accuracy': float(accuracy), 'train_seconds': seconds}
+
+
+def rank_results(results):
+    """Average the per-fold results of every configuration, best first."""
+    grouped = pd.DataFrame(results).groupby(['hidden_units', 'steps', 'learning_rate'])
+    table = grouped['accuracy'].agg(['mean', 'std']).rename(
+        columns={'mean': 'accuracy_mean', 'std': 'accuracy_std'})
+    table['train_seconds'] = grouped['train_seconds'].mean()
+    table['folds'] = grouped['fold'].count()
+    return table.sort_values(['accuracy_mean', 'train_seconds'], ascending=[False, True]).reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validate a grid of ACAT classifier settings.')
+    parser.add_argument('--data', default='completeData.csv')
+    parser.add_argument('--hidden-units', action='append', default=None,
+                        help='comma-separated layer sizes; repeat for more configurations (default: 10,20,10)')
+    parser.add_argument('--steps', type=int, nargs='+', default=[2000])
+    parser.add_argument('--learning-rate', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0, help='seed for the fold split and weight initialisation')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='sweep_results.csv')
+    args = parser.parse_args(argv)
+    hidden_units = [tuple(int(u) for u in h.split(',')) for h in (args.hidden_units or ['10,20,10'])]
+
+    #encode once and share the arrays read-only with every worker
+    ds = read_inventory(args.data)
+    labels = ds.pop(label_column)
+    df_num, df_labels = pd.factorize(labels)
+    encoder = FeatureEncoder.fit(ds, labels=df_labels)
+    workdir = tempfile.mkdtemp(prefix='acat_sweep_data_')
+    data_path = os.path.join(workdir, 'data.npy')
+    target_path = os.path.join(workdir, 'target.npy')
+    np.save(data_path, encoder.transform_indices(ds))
+    np.save(target_path, df_num.astype(np.int32))
+
+    folds = fold_indices(len(df_num), args.folds, args.seed)
+    tasks = [{'hidden_units': h, 'steps': s, 'learning_rate': lr, 'n_classes': len(df_labels),
+              'seed': args.seed, 'fold': k, 'train': train, 'test': test}
+             for h, s, lr in itertools.product(hidden_units, args.steps, args.learning_rate)
+             for k, (train, test) in enumerate(folds)]
+    print("running %d configurations x %d folds on %d workers"
+          % (len(tasks) // args.folds, args.folds, args.workers))
+
+    # TensorFlow is not fork-safe, so workers are spawned fresh
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(args.workers, initializer=_init_worker, initargs=(data_path, target_path, encoder.width))
+    try:
+        results = []
+        for result in pool.imap_unordered(run_fold, tasks):
+            results.append(result)
+            print("%(hidden_units)s steps=%(steps)d lr=%(learning_rate)g fold %(fold)d: %(accuracy).4f" % result)
+    finally:
+        pool.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    table = rank_results(results)
+    table.to_csv(args.output, index=False)
+    print(table.to_string(index=False))
+    print("results written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,790 @@
+"""
+Claims coverage agent: importable library and command-line entry point.
+
+Importing this module does no I/O. A ClaimsAgent reads its Settings from
+the environment (and the .env file) when constructed, and builds the
+expensive pieces -- OAuth token provider, LLM backend, caches, policy and
+reference indexes -- on first use. Batches run only when asked:
+
+    python -m claims_agent run                      # TEST -> submission.csv
+    python -m claims_agent run --mode structured --backend fake
+    python -m claims_agent evaluate --modes chain,rules+structured
+
+Every option also has an environment variable (see settings_from_env).
+
+A single claim runs as a LangGraph state machine (build_claim_graph):
+the deterministic rules decide first, and only undecided claims fan out
+into the record and policy summaries, which run as parallel branches and
+join at the coverage check. Without langgraph installed the same steps
+run on a small thread pool.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TypedDict
+
+from claims_trace import Tracer
+
+log = logging.getLogger("claims_agent")
+
+ENV_FILE = "./Data/UAIS_vars.env"
+TOKEN_URL = "https://api.uhg.com/oauth2/token"
+TOKEN_SCOPE = "https://api.uhg.com/.default"
+
+
+class Settings(NamedTuple):
+    # Azure OpenAI deployment
+    endpoint: Optional[str] = None
+    model_name: Optional[str] = None  # gpt-4o-mini_2024-07-18
+    project_id: Optional[str] = None
+    api_version: Optional[str] = None
+    client_id: Optional[str] = None
+    client_secret: Optional[str] = None
+    token_refresh_margin: float = 300.0
+    # "azure" or "fake" (profile from FAKE_LLM_PROFILE)
+    backend: str = "azure"
+    # input files
+    reference_codes_path: str = "./data/reference_codes.json"
+    policies_path: str = "./data/insurance_policies.json"
+    validation_path: str = "./data/validation_records.json"
+    test_path: str = "./data/test_records.json"
+    # batch execution; mode "chain": three calls per claim, "structured": one call per pack of claims
+    mode: str = "chain"
+    rule_fast_path: bool = True
+    max_concurrency: int = 8
+    chunk_size: int = 1000
+    claims_per_request: int = 10
+    prompt_token_budget: int = 12000  # per structured request
+    summary_token_budget: int = 3000  # per record/policy summary prompt; 0 disables trimming
+    requests_per_second: float = 5.0
+    timeout: float = 60.0
+    max_retries: int = 4
+    # outputs and caches ("" disables a cache)
+    submission_path: str = "submission.csv"
+    submission_parquet: str = ""  # also write decision/reason columns to this Parquet file
+    clean_responses: bool = False  # collapse whitespace and newlines in generated_response
+    journal_path: str = "submission.journal.jsonl"
+    resume: bool = True
+    trace_output: str = "claims_trace.json"
+    eval_modes: str = "chain,structured,rules+chain,rules+structured"
+    eval_output: str = "evaluation_report.json"
+    policy_summary_cache: str = "./data/cache/policy_summaries.sqlite"
+    response_cache: str = "./data/cache/llm_responses.sqlite"
+    response_cache_mb: float = 512.0
+    response_cache_ttl_hours: float = 0.0
+    prompt_cost_per_1k: float = 0.0
+    completion_cost_per_1k: float = 0.0
+
+
+def load_env_file(path: str = ENV_FILE) -> None:
+    """Load a .env file into os.environ if python-dotenv is installed."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(path)
+
+
+def settings_from_env(env_file: Optional[str] = ENV_FILE) -> Settings:
+    """Settings from environment variables, after loading `env_file`."""
+    if env_file:
+        load_env_file(env_file)
+    env = os.getenv
+    defaults = Settings()
+    return Settings(
+        endpoint=env("AZURE_OPENAI_ENDPOINT"),
+        model_name=env("MODEL_DEPLOYMENT_NAME"),
+        project_id=env("PROJECT_ID"),
+        api_version=env("OPENAI_API_VERSION"),
+        client_id=env("CLIENT_ID"),
+        client_secret=env("CLIENT_SECRET"),
+        token_refresh_margin=float(env("TOKEN_REFRESH_MARGIN_SECONDS", defaults.token_refresh_margin)),
+        backend=env("CLAIMS_LLM_BACKEND", defaults.backend),
+        reference_codes_path=env("CLAIMS_REFERENCE_CODES_PATH", defaults.reference_codes_path),
+        policies_path=env("CLAIMS_POLICIES_PATH", defaults.policies_path),
+        validation_path=env("CLAIMS_VALIDATION_PATH", defaults.validation_path),
+        test_path=env("CLAIMS_TEST_PATH", defaults.test_path),
+        mode=env("CLAIMS_MODE", defaults.mode),
+        rule_fast_path=env("CLAIMS_RULE_FAST_PATH", "1") == "1",
+        max_concurrency=int(env("CLAIMS_MAX_CONCURRENCY", defaults.max_concurrency)),
+        chunk_size=int(env("CLAIMS_CHUNK_SIZE", defaults.chunk_size)),
+        claims_per_request=int(env("CLAIMS_PER_REQUEST", defaults.claims_per_request)),
+        prompt_token_budget=int(env("PROMPT_TOKEN_BUDGET", defaults.prompt_token_budget)),
+        summary_token_budget=int(env("SUMMARY_PROMPT_TOKEN_BUDGET", defaults.summary_token_budget)),
+        requests_per_second=float(env("LLM_REQUESTS_PER_SECOND", defaults.requests_per_second)),
+        timeout=float(env("LLM_TIMEOUT_SECONDS", defaults.timeout)),
+        max_retries=int(env("LLM_MAX_RETRIES", defaults.max_retries)),
+        submission_path=env("CLAIMS_SUBMISSION_PATH", defaults.submission_path),
+        submission_parquet=env("CLAIMS_SUBMISSION_PARQUET", defaults.submission_parquet),
+        clean_responses=env("CLAIMS_CLEAN_RESPONSES", "0") == "1",
+        journal_path=env("CLAIMS_JOURNAL", defaults.journal_path),
+        resume=env("CLAIMS_RESUME", "1") == "1",
+        trace_output=env("CLAIMS_TRACE_OUTPUT", defaults.trace_output),
+        eval_modes=env("CLAIMS_EVAL_MODES", defaults.eval_modes),
+        eval_output=env("CLAIMS_EVAL_OUTPUT", defaults.eval_output),
+        policy_summary_cache=env("POLICY_SUMMARY_CACHE", defaults.policy_summary_cache),
+        response_cache=env("LLM_RESPONSE_CACHE", defaults.response_cache),
+        response_cache_mb=float(env("LLM_RESPONSE_CACHE_MB", defaults.response_cache_mb)),
+        response_cache_ttl_hours=float(env("LLM_RESPONSE_CACHE_TTL_HOURS", defaults.response_cache_ttl_hours)),
+        prompt_cost_per_1k=float(env("LLM_PROMPT_COST_PER_1K", defaults.prompt_cost_per_1k)),
+        completion_cost_per_1k=float(env("LLM_COMPLETION_COST_PER_1K", defaults.completion_cost_per_1k)),
+    )
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Progress messages go through logging: DEBUG shows every claim and call, WARNING keeps runs quiet."""
+    level = level or os.getenv("CLAIMS_LOG_LEVEL", "INFO")
+    logging.basicConfig(level=level.upper(), format="%(message)s")
+
+
+def chunked(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Documents are embedded as compact JSON; see claims_prompts for sizing and budgets.
+
+def patient_record_prompt(record_str: Dict[str, Any], reference_index) -> str:
+    from claims_prompts import compact_json
+
+    return f"""You are a medical claim summarizer. Summarize the following patient insurance claim record into a structured summary.
+Include: Patient Demographics, Insurance Policy ID, Diagnoses, Procedures, Preauthorization Status, Billed Amount, and Date of Service.
+
+Use bullet points. Do not make decisions.
+Map ICD-10 and CPT codes using reference descriptions.
+
+Patient Record:
+{compact_json(record_str)}
+Reference Codes:
+{compact_json(reference_index.describe_document(record_str))}"""
+
+
+def policy_prompt(policy_data: Dict[str, Any], reference_index) -> str:
+    from claims_prompts import compact_json
+
+    return f"""You are a policy summarizer. Summarize this insurance policy into labeled sections:
+- Policy Details
+- Covered Procedures (with CPT and ICD-10 descriptions, gender restriction, age range, preauthorization requirement, and notes).
+
+Policy Document:
+{compact_json(policy_data)}
+Reference Codes:
+{compact_json(reference_index.describe_document(policy_data))}"""
+
+
+def coverage_prompt(record_summary: str, policy_summary: str) -> str:
+    return f"""Determine claim coverage eligibility based on:
+1. Diagnosis and procedure match between patient record and policy.
+2. Age, gender, and preauthorization compliance.
+3. Billed amount vs coverage limit.
+
+Return decision and reasoning in the format:
+- Decision: APPROVE or ROUTE FOR REVIEW
+- Reason: <brief justification>
+
+Patient Summary:
+{record_summary}
+
+Policy Summary:
+{policy_summary}"""
+
+
+class ClaimState(TypedDict, total=False):
+    record: Dict[str, Any]
+    rules_checked: bool  # True when the caller already applied (or disabled) the rules
+    decision: Optional[str]
+    reason: Optional[str]
+    record_summary: str
+    policy_summary: str
+    result: str
+
+
+def route_after_rules(state: ClaimState):
+    """Rule-decided claims skip the LLM; the rest fan out into both summaries."""
+    if state.get("decision"):
+        return "decided"
+    return ["summarize_record", "summarize_policy"]
+
+
+def build_claim_graph(agent: "ClaimsAgent"):
+    """
+    check_rules -> decided -> END
+                -> summarize_record + summarize_policy (in parallel) -> check_coverage -> END
+    """
+    from langgraph.graph import END, START, StateGraph
+
+    graph = StateGraph(ClaimState)
+    graph.add_node("check_rules", agent.check_rules_node)
+    graph.add_node("decided", agent.decided_node)
+    graph.add_node("summarize_record", agent.summarize_record_node)
+    graph.add_node("summarize_policy", agent.summarize_policy_node)
+    graph.add_node("check_coverage", agent.check_coverage_node)
+    graph.add_edge(START, "check_rules")
+    graph.add_conditional_edges("check_rules", route_after_rules,
+                                ["decided", "summarize_record", "summarize_policy"])
+    # the coverage check waits for both branches
+    graph.add_edge(["summarize_record", "summarize_policy"], "check_coverage")
+    graph.add_edge("decided", END)
+    graph.add_edge("check_coverage", END)
+    return graph.compile()
+
+
+class ClaimsAgent:
+    """
+    The three-tool claim pipeline (record summary, policy summary, coverage
+    check), its single-request structured variant, and the batch runners.
+    Clients, caches and data indexes are created lazily and shared by all
+    worker threads.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, llm: Any = None):
+        self.settings = settings if settings is not None else settings_from_env()
+        self.tracer = Tracer(prompt_cost_per_1k=self.settings.prompt_cost_per_1k,
+                             completion_cost_per_1k=self.settings.completion_cost_per_1k)
+        self._resources: Dict[str, Any] = {}
+        if llm is not None:
+            self._resources["llm"] = llm
+        self._init_lock = threading.RLock()
+
+    def _lazy(self, name: str, factory: Callable[[], Any]) -> Any:
+        try:
+            return self._resources[name]
+        except KeyError:
+            pass
+        with self._init_lock:
+            if name not in self._resources:
+                self._resources[name] = factory()
+            return self._resources[name]
+
+    # ---- lazily built resources ----
+
+    @property
+    def token_provider(self):
+        """Shared UHG OAuth2 token, cached with its expiry and refreshed before it lapses."""
+        def build():
+            from claims_auth import OAuthTokenProvider
+
+            s = self.settings
+            return OAuthTokenProvider(TOKEN_URL, client_id=s.client_id, client_secret=s.client_secret,
+                                      scope=TOKEN_SCOPE, refresh_margin=s.token_refresh_margin)
+        return self._lazy("token_provider", build)
+
+    @property
+    def llm(self):
+        def build():
+            from claims_llm import make_backend
+
+            s = self.settings
+            log.info(f"⚙️ Initializing {s.backend} LLM backend...")
+            options = {}
+            if s.backend == "azure":
+                options = dict(endpoint=s.endpoint, deployment=s.model_name, api_version=s.api_version,
+                               project_id=s.project_id, azure_ad_token_provider=self.token_provider)
+            backend = make_backend(s.backend, **options)
+            log.info("✅ LLM backend initialized.")
+            return backend
+        return self._lazy("llm", build)
+
+    @property
+    def rate_limiter(self):
+        def build():
+            from claims_engine import TokenBucket
+
+            return TokenBucket(self.settings.requests_per_second)
+        return self._lazy("rate_limiter", build)
+
+    @property
+    def response_cache(self):
+        """Completions cached by model, messages and sampling parameters; None when disabled."""
+        def build():
+            from claims_llm import ResponseCache
+
+            s = self.settings
+            if not s.response_cache:
+                return None
+            return ResponseCache(s.response_cache, max_bytes=int(s.response_cache_mb * 2 ** 20),
+                                 ttl=s.response_cache_ttl_hours * 3600 or None)
+        return self._lazy("response_cache", build)
+
+    @property
+    def policy_summary_cache(self):
+        """Policy summaries keyed by policy ID, content, prompt and model; each is summarized once."""
+        def build():
+            from claims_cache import MemoCache
+
+            return MemoCache(self.settings.policy_summary_cache or None, namespace="policy_summary")
+        return self._lazy("policy_summary_cache", build)
+
+    @property
+    def policy_index(self) -> Dict[str, Dict[str, Any]]:
+        def build():
+            from claims_data import index_policies, iter_records
+
+            index = index_policies(iter_records(self.settings.policies_path))
+            log.info(f"✅ Loaded {len(index)} policies.")
+            return index
+        return self._lazy("policy_index", build)
+
+    @property
+    def policy_tables(self):
+        """The policy index flattened once for the coverage rules."""
+        def build():
+            from claims_rules import policy_tables
+
+            return policy_tables(self.policy_index)
+        return self._lazy("policy_tables", build)
+
+    @property
+    def reference_index(self):
+        def build():
+            from claims_data import ReferenceIndex, load_json
+
+            return ReferenceIndex(load_json(self.settings.reference_codes_path))
+        return self._lazy("reference_index", build)
+
+    @property
+    def claim_graph(self):
+        """Compiled per-claim graph, or None when langgraph is not installed."""
+        def build():
+            try:
+                return build_claim_graph(self)
+            except ImportError:
+                log.debug("langgraph is not installed; claims run on the built-in branch executor.")
+                return None
+        return self._lazy("claim_graph", build)
+
+    @property
+    def branch_pool(self) -> ThreadPoolExecutor:
+        """Threads for the parallel summary branches when running without langgraph."""
+        return self._lazy("branch_pool", lambda: ThreadPoolExecutor(
+            max_workers=2 * self.settings.max_concurrency, thread_name_prefix="claim-branch"))
+
+    @property
+    def validation(self):
+        """VALIDATION records, streamed from disk on each iteration."""
+        from claims_data import RecordFile
+
+        return RecordFile(self.settings.validation_path)
+
+    @property
+    def test(self):
+        """TEST records, streamed from disk on each iteration."""
+        from claims_data import RecordFile
+
+        return RecordFile(self.settings.test_path)
+
+    # ---- LLM tools ----
+
+    def chat(self, messages, temperature: float, trimmed: bool = False, **params) -> str:
+        """
+        Sends one chat completion request, rate limited and retried on transient errors,
+        unless an identical request is already in the response cache. The prompt size
+        (and `trimmed`, whether it was cut to a budget) goes to the tracer.
+        """
+        from claims_engine import call_with_retry
+        from claims_prompts import count_message_tokens
+
+        llm, cache, limiter = self.llm, self.response_cache, self.rate_limiter
+        waits, retries = [], []
+
+        def call():
+            waits.append(limiter.acquire())
+            return llm.complete(messages, temperature=temperature, timeout=self.settings.timeout, **params)
+
+        def send():
+            return call_with_retry(call, retries=self.settings.max_retries, on_retry=lambda *_: retries.append(1))
+
+        prompt_size = count_message_tokens(messages, self.settings.model_name)
+        start = time.perf_counter()
+        completion = None
+        try:
+            if cache is None:
+                completion = send()
+            else:
+                completion = cache.complete(llm.model, messages, temperature, params, send)
+            return completion.content
+        finally:
+            self.tracer.record_call(time.perf_counter() - start, completion, retries=len(retries), wait=sum(waits),
+                                    prompt_size=prompt_size, trimmed=trimmed)
+
+    def fit_prompt(self, render: Callable[[Any], str], document: Any, keep=None):
+        """(prompt, trimmed): render(document) within summary_token_budget."""
+        from claims_prompts import fit_document
+
+        prompt, tokens, trimmed = fit_document(document, render, self.settings.summary_token_budget,
+                                               model=self.settings.model_name, keep=keep)
+        if trimmed:
+            log.debug(f"✂️ Prompt trimmed to {tokens} tokens.")
+        return prompt, trimmed
+
+    def summarize_patient_record(self, record_str: Dict[str, Any]) -> str:
+        """Creates a structured summary of a patient's record for downstream validation."""
+        from claims_prompts import RECORD_PROMPT_FIELDS
+
+        with self.tracer.span("record_summary"):
+            log.debug("🩺 Summarizing patient record...")
+            prompt, trimmed = self.fit_prompt(lambda r: patient_record_prompt(r, self.reference_index),
+                                              record_str, keep=RECORD_PROMPT_FIELDS)
+            summary = self.chat(
+                messages=[
+                    {"role": "system", "content": "You are a medical insurance data summarizer."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2,
+                trimmed=trimmed
+            )
+            log.debug("✅ Patient record summarized.")
+            return summary
+
+    def summarize_policy_guideline(self, policy_id: str) -> str:
+        from claims_cache import content_hash, make_key
+        from claims_prompts import POLICY_PROMPT_FIELDS
+
+        with self.tracer.span("policy_summary"):
+            log.debug(f"📘 Summarizing policy guideline for {policy_id}...")
+            policy_data = self.policy_index.get(policy_id)
+            if not policy_data:
+                return f"⚠️ Policy ID {policy_id} not found."
+
+            prompt, trimmed = self.fit_prompt(lambda p: policy_prompt(p, self.reference_index),
+                                              policy_data, keep=POLICY_PROMPT_FIELDS)
+            messages = [
+                {"role": "system", "content": "You summarize insurance policy coverage rules."},
+                {"role": "user", "content": prompt}
+            ]
+            key = make_key(policy_id, content_hash(policy_data), content_hash(messages), self.llm.model,
+                           self.settings.api_version)
+            summary = self.policy_summary_cache.get_or_compute(
+                key, lambda: self.chat(messages=messages, temperature=0.2, trimmed=trimmed))
+            log.debug(f"✅ Policy {policy_id} summarized.")
+            return summary
+
+    def check_claim_coverage(self, record_summary: str, policy_summary: str) -> str:
+        with self.tracer.span("coverage_check"):
+            log.debug("🧮 Validating insurance claim coverage...")
+            result = self.chat(
+                messages=[
+                    {"role": "system", "content": "You are an insurance claim coverage validator."},
+                    {"role": "user", "content": coverage_prompt(record_summary, policy_summary)}
+                ],
+                temperature=0
+            )
+            log.debug("✅ Claim validation complete.")
+            return result
+
+    # ---- claim graph nodes: each returns the state keys it sets ----
+
+    def check_rules_node(self, state: ClaimState) -> ClaimState:
+        from claims_rules import evaluate_claims
+
+        if state.get("rules_checked"):
+            return {}
+        with self.tracer.span("rules"):
+            rule = evaluate_claims([state["record"]], self.policy_tables).iloc[0]
+        return {"rules_checked": True, "decision": rule["decision"], "reason": rule["reason"]}
+
+    def decided_node(self, state: ClaimState) -> ClaimState:
+        from claims_rules import format_decision
+
+        return {"result": format_decision(state["decision"], state["reason"])}
+
+    def summarize_record_node(self, state: ClaimState) -> ClaimState:
+        return {"record_summary": self.summarize_patient_record(state["record"])}
+
+    def summarize_policy_node(self, state: ClaimState) -> ClaimState:
+        return {"policy_summary": self.summarize_policy_guideline(state["record"]["insurance_policy_id"])}
+
+    def check_coverage_node(self, state: ClaimState) -> ClaimState:
+        return {"result": self.check_claim_coverage(state["record_summary"], state["policy_summary"])}
+
+    def _run_claim_steps(self, state: ClaimState) -> ClaimState:
+        # same topology as build_claim_graph, for environments without langgraph
+        state = dict(state, **self.check_rules_node(state))
+        if route_after_rules(state) == "decided":
+            return dict(state, **self.decided_node(state))
+        policy_branch = self.branch_pool.submit(self.summarize_policy_node, state)
+        state.update(self.summarize_record_node(state))
+        state.update(policy_branch.result())
+        return dict(state, **self.check_coverage_node(state))
+
+    def process_claim(self, record: Dict[str, Any], rules_checked: bool = False) -> str:
+        """
+        Runs one claim through the claim graph. With rules_checked=False the
+        rule fast path (if enabled) is applied to the claim first.
+        """
+        with self.tracer.span("claim"):
+            log.debug(f"🧩 Processing patient {record['patient_id']}...")
+            state: ClaimState = {"record": record,
+                                 "rules_checked": rules_checked or not self.settings.rule_fast_path}
+            graph = self.claim_graph
+            final = graph.invoke(state) if graph is not None else self._run_claim_steps(state)
+            log.debug(f"🏁 Completed processing for {record['patient_id']}.")
+            return final["result"]
+
+    def process_claims_structured(self, records) -> Dict[Any, str]:
+        """
+        Decides several claims with one structured request (raw records plus the
+        policy procedures they bill); returns {patient_id: response}.
+        """
+        from claims_rules import format_decision
+        from claims_structured import RESPONSE_FORMAT, build_messages, parse_response
+
+        with self.tracer.span("structured_request"):
+            log.debug(f"🧩 Processing {len(records)} claims in one structured request...")
+            result = self.chat(
+                messages=build_messages(records, self.policy_index, self.reference_index),
+                temperature=0,
+                response_format=RESPONSE_FORMAT,
+            )
+            decisions = parse_response(result)
+            responses = {}
+            for record in records:
+                decision = decisions.get(str(record["patient_id"]))
+                if decision is not None:
+                    responses[record["patient_id"]] = format_decision(decision["decision"], decision["reason"])
+                elif len(records) > 1:
+                    # the model skipped this claim; ask again for it alone
+                    responses.update(self.process_claims_structured([record]))
+                else:
+                    raise ValueError(f"No decision returned for {record['patient_id']}")
+            log.debug(f"🏁 Completed {len(records)} claims.")
+            return responses
+
+    # ---- batch runners ----
+
+    def run_record(self, record: Dict[str, Any]):
+        try:
+            # the batch runner has already applied the rules to this claim's chunk
+            return record["patient_id"], self.process_claim(record, rules_checked=True), False
+        except Exception as e:
+            log.warning(f"⚠️ Error processing {record['patient_id']}: {str(e)}")
+            return record["patient_id"], f"Error: {str(e)}", True
+
+    def run_pack(self, records):
+        try:
+            return [(pid, response, False) for pid, response in self.process_claims_structured(records).items()]
+        except Exception as e:
+            log.warning(f"⚠️ Error processing {len(records)} claims: {str(e)}")
+            return [(record["patient_id"], f"Error: {str(e)}", True) for record in records]
+
+    def run_claims(self, records, journal, mode: Optional[str] = None, rule_fast_path: Optional[bool] = None,
+                   writer=None):
+        """
+        Processes every record not already in the journal, streaming `records` chunk
+        by chunk; returns (patient_ids in input order, number of claims processed).
+        Each response also goes to `writer` (a SubmissionWriter) as it arrives.
+        """
+        from claims_engine import imap_completed
+        from claims_rules import evaluate_claims, format_decision
+        from claims_structured import pack_claims
+
+        s = self.settings
+        mode = mode or s.mode
+        rule_fast_path = s.rule_fast_path if rule_fast_path is None else rule_fast_path
+        order = []
+        processed = [0]
+
+        def finish(patient_id, response, failed=False):
+            journal.append(patient_id, response, failed)
+            if writer is not None:
+                writer.add(patient_id, response)
+
+        def undecided_chunks():
+            for chunk in chunked(records, s.chunk_size):
+                ids = [record["patient_id"] for record in chunk]
+                order.extend(ids)
+                pending = [record for record in chunk if record["patient_id"] not in journal]
+                if writer is not None:
+                    writer.expect(ids)
+                    for pid in ids:
+                        if pid in journal:
+                            writer.add(pid, journal.response(pid))
+                processed[0] += len(pending)
+                # Hard coverage constraints are checked for the whole chunk at once;
+                # only claims the rules cannot decide go through the LLM
+                undecided = pending
+                if rule_fast_path and pending:
+                    with self.tracer.span("rules"):
+                        rule_results = evaluate_claims(pending, self.policy_tables)
+                    undecided = []
+                    for record, rule in zip(pending, rule_results.itertuples()):
+                        if rule.decision is None:
+                            undecided.append(record)
+                        else:
+                            finish(record["patient_id"], format_decision(rule.decision, rule.reason))
+                    log.debug(f"⚡ Rules decided {len(pending) - len(undecided)} of {len(pending)} claims.")
+                # one fsync per chunk for the rule decisions and the LLM results so far
+                journal.sync()
+                yield undecided
+
+        # LLM claims run concurrently while later chunks are still being read;
+        # each result is journaled as soon as it finishes
+        if mode == "structured":
+            packs = (pack for undecided in undecided_chunks()
+                     for pack in pack_claims(undecided, self.policy_index, self.reference_index,
+                                             token_budget=s.prompt_token_budget, max_claims=s.claims_per_request))
+            for _, _, rows in imap_completed(self.run_pack, packs, max_workers=s.max_concurrency):
+                for row in rows:
+                    finish(*row)
+        else:
+            records_to_run = (record for undecided in undecided_chunks() for record in undecided)
+            for _, _, row in imap_completed(self.run_record, records_to_run, max_workers=s.max_concurrency):
+                finish(*row)
+
+        if processed[0] < len(order):
+            log.info(f"↩️ Resumed: {len(order) - processed[0]} of {len(order)} claims were already journaled.")
+        return order, processed[0]
+
+    def run_submission(self):
+        """
+        Runs the agent over TEST (resuming from the journal), writing the submission
+        CSV (and Parquet, if configured) in TEST order while claims finish; returns
+        the CSV path. Responses are streamed to disk, never held all at once.
+        """
+        from claims_journal import Journal
+        from claims_output import SubmissionWriter
+
+        s = self.settings
+        log.info(f"📂 Processing claims from {s.test_path}...")
+        # a journal is only resumed by a run with the same input and settings
+        journal = Journal(s.journal_path, resume=s.resume, run={
+            "input": os.path.abspath(s.test_path), "mode": s.mode, "rule_fast_path": s.rule_fast_path,
+            "backend": s.backend, "model": s.model_name})
+        try:
+            with SubmissionWriter(s.submission_path, parquet_path=s.submission_parquet or None,
+                                  clean=s.clean_responses) as writer:
+                _, processed = self.run_claims(self.test, journal, writer=writer)
+        finally:
+            journal.close()
+
+        self._log_run_summary(self.tracer.export(s.trace_output, claims=processed)["run"])
+        log.info(f"⏱️ Trace written to {s.trace_output}")
+        log.info(f"✅ Submission file generated: {s.submission_path}"
+                 + (f" (and {s.submission_parquet})" if s.submission_parquet else ""))
+        return s.submission_path
+
+    def evaluate(self, modes: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Runs every mode ("chain", "structured", optionally prefixed "rules+") over
+        VALIDATION and scores the Decision lines against the expected decisions;
+        accuracy, confusion matrix, latency and tokens per mode go to eval_output,
+        per-claim predictions alongside as CSV. Each mode runs with empty,
+        in-memory response and policy-summary caches, so no mode reports
+        latencies and tokens of completions cached by an earlier mode or run.
+        """
+        import pandas as pd
+        from claims_eval import format_report, parse_modes, predictions, score
+        from claims_journal import Journal
+
+        s = self.settings
+        modes = modes or s.eval_modes
+        log.info(f"📊 Evaluating {modes} on {s.validation_path}...")
+        reports, frames = {}, []
+        saved = {name: self._resources.get(name) for name in ("response_cache", "policy_summary_cache")}
+        try:
+            for name, mode, rule_fast_path in parse_modes(modes):
+                self._cold_caches()
+                self.tracer.reset()
+                journal = Journal(None)
+                _, processed = self.run_claims(self.validation, journal, mode=mode, rule_fast_path=rule_fast_path)
+                frame = predictions(self.validation, journal.responses())
+                reports[name] = {"score": score(frame), "trace": self.tracer.summary(claims=processed)}
+                frames.append(frame.assign(mode=name))
+                log.info(f"✅ {name}: accuracy {reports[name]['score']['accuracy']}")
+        finally:
+            with self._init_lock:
+                for name, cache in saved.items():
+                    if cache is None:
+                        self._resources.pop(name, None)
+                    else:
+                        self._resources[name] = cache
+        with open(s.eval_output, "w") as f:
+            json.dump(reports, f, indent=2)
+        predictions_path = os.path.splitext(s.eval_output)[0] + "_predictions.csv"
+        pd.concat(frames).to_csv(predictions_path, index=False)
+        log.info("\n" + format_report(reports))
+        log.info(f"✅ Evaluation written to {s.eval_output} and {predictions_path}")
+        return reports
+
+    def _cold_caches(self) -> None:
+        """Swap in empty in-memory caches (evaluation measures every mode cold)."""
+        from claims_cache import MemoCache
+        from claims_llm import ResponseCache
+
+        with self._init_lock:
+            self._resources["response_cache"] = ResponseCache(None) if self.settings.response_cache else None
+            self._resources["policy_summary_cache"] = MemoCache(None, namespace="policy_summary")
+
+    @staticmethod
+    def _log_run_summary(run_summary: Dict[str, Any]) -> None:
+        log.info(f"⏱️ {run_summary['claims']} claims in {run_summary['wall_seconds']:.1f}s, "
+                 f"{run_summary['llm_calls']} LLM calls ({run_summary['cache_hits']} cached), "
+                 f"{run_summary['tokens_per_claim']} tokens/claim")
+
+
+def main(argv: Optional[List[str]] = None) -> Any:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--env-file", default=ENV_FILE)
+    common.add_argument("--log-level", default=None, help="DEBUG, INFO (default) or WARNING")
+    common.add_argument("--backend", choices=["azure", "fake"], default=None)
+    common.add_argument("--mode", choices=["chain", "structured"], default=None)
+    common.add_argument("--no-rules", action="store_true", help="send every claim to the LLM")
+    common.add_argument("--concurrency", type=int, default=None)
+    common.add_argument("--trace-output", default=None)
+    parser = argparse.ArgumentParser(prog="claims_agent", description="Claims coverage agent.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    run = commands.add_parser("run", parents=[common], help="process TEST and write the submission")
+    run.add_argument("--input", default=None, help="claims file (JSON array or JSON Lines)")
+    run.add_argument("--output", default=None, help="submission CSV")
+    run.add_argument("--parquet", default=None, help="also write the submission with decision/reason as Parquet")
+    run.add_argument("--clean", action="store_true", help="collapse whitespace in the responses")
+    run.add_argument("--journal", default=None)
+    run.add_argument("--fresh", action="store_true", help="ignore the existing journal")
+    evaluate = commands.add_parser("evaluate", parents=[common], help="score processing modes on VALIDATION")
+    evaluate.add_argument("--input", default=None, help="labelled claims file")
+    evaluate.add_argument("--modes", default=None, help="e.g. chain,structured,rules+chain")
+    evaluate.add_argument("--output", default=None, help="report JSON")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level)
+    settings = settings_from_env(args.env_file)
+    overrides = {
+        "backend": args.backend,
+        "mode": args.mode,
+        "rule_fast_path": False if args.no_rules else None,
+        "max_concurrency": args.concurrency,
+        "trace_output": args.trace_output,
+    }
+    if args.command == "run":
+        overrides.update(test_path=args.input, submission_path=args.output, journal_path=args.journal,
+                         resume=False if args.fresh else None, submission_parquet=args.parquet,
+                         clean_responses=True if args.clean else None)
+    else:
+        overrides.update(validation_path=args.input, eval_modes=args.modes, eval_output=args.output)
+    settings = settings._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+    agent = ClaimsAgent(settings)
+    if args.command == "run":
+        from claims_journal import JournalMismatch
+
+        try:
+            return agent.run_submission()
+        except JournalMismatch as e:
+            parser.error(str(e))
+    return agent.evaluate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Shared OAuth2 client-credentials token provider.
+
+One OAuthTokenProvider serves every client and worker: it caches the
+access token with its expiry, refreshes it `refresh_margin` seconds
+before it lapses, or halfway through its lifetime if that is sooner
+(falling back to the still-valid token if that early refresh fails),
+lets only one thread refresh at a time, and reuses a pooled HTTP
+connection to the token endpoint. Instances are callables
+returning the current token, so they plug straight into
+AzureOpenAI(azure_ad_token_provider=...).
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from claims_engine import call_with_retry
+
+log = logging.getLogger(__name__)
+
+
+class OAuthTokenProvider:
+    """Cached, proactively refreshed client-credentials access token."""
+
+    def __init__(self, token_url: str, client_id: Optional[str], client_secret: Optional[str], scope: str,
+                 refresh_margin: float = 300.0, timeout: float = 60.0, retries: int = 3):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.retries = retries
+        self.refreshes = 0
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._margin = refresh_margin  # refresh_margin, clamped to half the current token's lifetime
+        self._next_early_refresh = 0.0  # after a failed early refresh, wait before trying again
+        self._refresh_lock = threading.Lock()
+        self._http = None
+
+    def _client(self):
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.Client(timeout=self.timeout)
+        return self._http
+
+    def _fetch(self) -> None:
+        log.info("🔐 Fetching access token...")
+        body = {
+            "grant_type": "client_credentials",
+            "scope": self.scope,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+        def post():
+            resp = self._client().post(self.token_url, headers=headers, data=body)
+            resp.raise_for_status()
+            return resp.json()
+
+        requested = time.monotonic()
+        payload = call_with_retry(post, retries=self.retries)
+        expires_in = float(payload.get("expires_in", 3600))
+        self._token = payload["access_token"]
+        # expiry counts from when the request was sent, so network time is not overestimated
+        self._expires_at = requested + expires_in
+        self._margin = min(self.refresh_margin, expires_in / 2)
+        self.refreshes += 1
+        log.info(f"✅ Access token retrieved (valid for {payload.get('expires_in', 3600)}s).")
+
+    def token(self) -> str:
+        """Return a valid access token, refreshing it if it is about to expire."""
+        remaining = self._expires_at - time.monotonic()
+        if self._token is not None and remaining > self._margin:
+            return self._token
+        if self._token is not None and remaining > 0:
+            # still valid: one caller refreshes early, the others keep using the current token
+            if time.monotonic() < self._next_early_refresh or not self._refresh_lock.acquire(blocking=False):
+                return self._token
+        else:
+            self._refresh_lock.acquire()
+        try:
+            if self._token is None or self._expires_at - time.monotonic() <= self._margin:
+                try:
+                    self._fetch()
+                except Exception as e:
+                    remaining = self._expires_at - time.monotonic()
+                    if self._token is None or remaining <= 0:
+                        raise
+                    # the current token still works; retry the refresh in a while
+                    self._next_early_refresh = time.monotonic() + min(30.0, remaining / 2)
+                    log.warning(f"⚠️ Early token refresh failed ({e}); "
+                                f"using the current token for its remaining {remaining:.0f}s.")
+            return self._token
+        finally:
+            self._refresh_lock.release()
+
+    __call__ = token
+
+    def close(self) -> None:
+        if self._http is not None:
+            self._http.close()
+            self._http = None
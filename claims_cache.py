@@ -0,0 +1,233 @@
+"""
+Memoisation for expensive, repeatable LLM work (e.g. policy summaries).
+
+MemoCache layers an in-memory LRU over a SQLite file so results survive
+between runs, and collapses concurrent misses for the same key into a
+single computation: the first caller computes, the others wait for it.
+Stored entries can expire after a TTL, and each namespace can be capped
+in bytes, evicting the least recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# a disk hit rewrites its access time only when the stored one is older than this,
+# and rewrites are batched, so read-heavy runs do not write on every lookup
+ACCESS_RESOLUTION = 300.0
+ACCESS_BATCH = 64
+
+
+def content_hash(value: Any) -> str:
+    """Stable SHA-256 of a JSON-serialisable value (dict key order does not matter)."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """Combine key parts (ids, hashes, model names) into one cache key."""
+    return content_hash([str(p) for p in parts])
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class MemoCache:
+    """In-memory LRU in front of an optional SQLite store, with single-flight misses."""
+
+    def __init__(self, path: Optional[str] = None, max_items: int = 1024, namespace: str = "memo",
+                 max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_items = max_items
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._bytes = 0
+        self._touched: Dict[str, float] = {}  # key -> access time not yet written
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memo ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " created REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(memo)")}
+            if "size" not in columns:
+                # stores written before size/LRU tracking
+                self._db.execute("ALTER TABLE memo ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                self._db.execute("ALTER TABLE memo ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+                self._db.execute("UPDATE memo SET size = length(value), accessed = created")
+            self._db.execute("CREATE INDEX IF NOT EXISTS memo_lru ON memo (namespace, accessed)")
+            self._db.commit()
+            self._bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM memo WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _cached(self, key: str) -> Optional[Any]:
+        # caller holds self._lock
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry[1]):
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, value: Any, created: float) -> None:
+        with self._lock:
+            self._lru[key] = (value, created)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[tuple]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created, accessed FROM memo WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._delete(key)
+                self._db.commit()
+                return None
+            now = time.time()
+            if now - row[2] > ACCESS_RESOLUTION:
+                self._touched[key] = now
+                if len(self._touched) >= ACCESS_BATCH:
+                    self._flush_access()
+                    self._db.commit()
+        return json.loads(row[0]), row[1]
+
+    def _flush_access(self) -> None:
+        # caller holds self._db_lock and commits
+        if self._touched:
+            self._db.executemany(
+                "UPDATE memo SET accessed = ? WHERE namespace = ? AND key = ?",
+                [(accessed, self.namespace, key) for key, accessed in self._touched.items()])
+            self._touched = {}
+
+    def _delete(self, key: str) -> None:
+        # caller holds self._db_lock
+        row = self._db.execute(
+            "SELECT size FROM memo WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM memo WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._bytes -= row[0]
+        self._touched.pop(key, None)
+
+    def _evict(self) -> None:
+        # caller holds self._db_lock; drops least recently used rows until under max_bytes
+        while self._bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key FROM memo WHERE namespace = ? ORDER BY accessed LIMIT 64", (self.namespace,)
+            ).fetchall()
+            if not rows:
+                break
+            for (key,) in rows:
+                self._delete(key)
+                if self._bytes <= self.max_bytes:
+                    break
+
+    def _store(self, key: str, value: Any, created: float) -> None:
+        if self._db is None:
+            return
+        data = json.dumps(value)
+        with self._db_lock:
+            self._delete(key)
+            self._db.execute(
+                "INSERT INTO memo (namespace, key, value, created, size, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, data, created, len(data), created),
+            )
+            self._bytes += len(data)
+            if self.max_bytes is not None:
+                self._flush_access()  # evict by up-to-date access times
+                self._evict()
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached value from memory or disk, or None."""
+        with self._lock:
+            entry = self._cached(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            self._remember(key, *entry)
+        return entry[0]
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, computing it at most once across threads."""
+        with self._lock:
+            entry = self._cached(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _Flight()
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            with self._lock:
+                self.hits += 1
+            return flight.value
+
+        try:
+            entry = self._load(key)
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                value, created = compute(), time.time()
+                self._store(key, value, created)
+            else:
+                with self._lock:
+                    self.hits += 1
+                value, created = entry
+            self._remember(key, value, created)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._flush_access()
+                self._db.commit()
+                self._db.close()
+            self._db = None
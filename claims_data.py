@@ -0,0 +1,221 @@
+"""
+Loaded-data layer for the claims agent: O(1) indexes over the policy and
+reference-code files, built once at startup, and streaming readers for
+claim files too large to hold in memory.
+
+iter_records() parses a top-level JSON array or JSON Lines file
+incrementally, yielding each record as soon as it is complete; with
+compact=True records become Record objects (shared key tuples, interned
+short strings) instead of dicts. RecordFile re-streams a file on every
+iteration.
+"""
+
+import json
+import re
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+def code_text(value: Any) -> Optional[str]:
+    """
+    A diagnosis/procedure code as a string: JSON numbers such as 99213 or
+    99213.0 become "99213"; None, booleans and containers give None.
+    """
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return str(value)
+    return None
+
+
+def load_json(file_path: str) -> Any:
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+class Record(Mapping):
+    """Read-only, dict-like record storing values in a tuple against a shared key tuple."""
+
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, keys: Tuple[str, ...], values: Tuple[Any, ...]):
+        self._keys = keys
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"Record({dict(self)!r})"
+
+
+_SCHEMAS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, str) and len(value) <= 32:
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(v) for v in value]
+    return value
+
+
+def compact_record(document: Dict[str, Any]) -> Record:
+    """Record with the same content; records sharing a schema share one key tuple."""
+    keys = tuple(document)
+    keys = _SCHEMAS.setdefault(keys, keys)
+    return Record(keys, tuple(_intern(v) for v in document.values()))
+
+
+_SKIP_WHITESPACE = re.compile(r"\s*")
+_SKIP_SEPARATORS = re.compile(r"[\s,]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*\Z")
+
+
+def iter_json_values(file_path: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array, or each value of a JSON
+    Lines / concatenated-JSON file, reading `chunk_size` characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size)
+        eof = not buffer
+        pos = _SKIP_WHITESPACE.match(buffer).end()
+        while pos == len(buffer) and not eof:
+            more = f.read(chunk_size)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+            pos = _SKIP_WHITESPACE.match(buffer).end()
+        in_array = buffer[pos:pos + 1] == "["
+        if in_array:
+            pos += 1
+        skip = _SKIP_SEPARATORS if in_array else _SKIP_WHITESPACE
+        while True:
+            pos = skip.match(buffer, pos).end()
+            if pos == len(buffer) or (in_array and buffer[pos] == "]"):
+                if in_array and pos < len(buffer):
+                    return
+                if eof:
+                    if in_array:
+                        raise ValueError(f"{file_path}: unterminated JSON array")
+                    return
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # a top-level number followed only by number characters up to the buffer
+                    # end (e.g. "65000000000." of "65000000000.5") may continue in the next chunk
+                    truncated = (isinstance(value, (int, float)) and not isinstance(value, bool)
+                                 and _NUMBER_TAIL.match(buffer, end) is not None)
+                    if eof or not truncated:
+                        yield value
+                        pos = end
+                        continue
+            # need more input: drop what was consumed and read the next chunk
+            more = f.read(chunk_size)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+
+
+def iter_records(file_path: str, compact: bool = False, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Stream the records of a JSON array or JSON Lines file."""
+    for value in iter_json_values(file_path, chunk_size=chunk_size):
+        yield compact_record(value) if compact and isinstance(value, dict) else value
+
+
+class RecordFile:
+    """Re-iterable view of a record file; each iteration streams it from disk."""
+
+    def __init__(self, file_path: str, compact: bool = True):
+        self.file_path = file_path
+        self.compact = compact
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter_records(self.file_path, compact=self.compact)
+
+    def __repr__(self) -> str:
+        return f"RecordFile({self.file_path!r})"
+
+
+def index_policies(policies: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Map policy_id -> policy document."""
+    return {p["policy_id"]: p for p in policies}
+
+
+class ReferenceIndex:
+    """
+    ICD-10 / CPT code -> description lookup.
+
+    Accepts the shapes reference_codes.json is found in:
+    {"ICD10": {code: desc}, "CPT": {code: desc}}, a flat {code: desc}
+    mapping, or a list of {"code", "description", "type"} entries.
+    """
+
+    def __init__(self, reference_codes: Any):
+        self.systems: Dict[str, str] = {}
+        self.descriptions: Dict[str, str] = {}
+        if isinstance(reference_codes, dict):
+            for key, value in reference_codes.items():
+                if isinstance(value, dict):
+                    for code, description in value.items():
+                        self._add(code, description, key)
+                else:
+                    self._add(key, value, None)
+        else:
+            for entry in reference_codes:
+                system = entry.get("type") or entry.get("system") or entry.get("code_type")
+                self._add(entry["code"], entry.get("description", ""), system)
+
+    def _add(self, code: Any, description: Any, system: Optional[str]) -> None:
+        code = code_text(code) or str(code).strip()
+        self.descriptions[code] = description if isinstance(description, str) else json.dumps(description)
+        self.systems[code] = system or "codes"
+
+    def __contains__(self, code: Any) -> bool:
+        return code_text(code) in self.descriptions
+
+    def describe(self, codes: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """Descriptions for the given codes, grouped by code system; unknown codes are skipped."""
+        grouped: Dict[str, Dict[str, str]] = {}
+        for code in sorted(set(code_text(c) or str(c).strip() for c in codes)):
+            if code in self.descriptions:
+                grouped.setdefault(self.systems[code], {})[code] = self.descriptions[code]
+        return grouped
+
+    def codes_in(self, document: Any) -> Set[str]:
+        """Every known code that appears as a value (string or number) anywhere in a record or policy."""
+        found: Set[str] = set()
+        stack: List[Any] = [document]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, Mapping):
+                stack.extend(value.values())
+            elif isinstance(value, (list, tuple)):
+                stack.extend(value)
+            else:
+                code = code_text(value)
+                if code in self.descriptions:
+                    found.add(code)
+        return found
+
+    def describe_document(self, document: Any) -> Dict[str, Dict[str, str]]:
+        """Reference descriptions for just the codes a record or policy mentions."""
+        return self.describe(self.codes_in(document))
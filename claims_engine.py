@@ -0,0 +1,149 @@
+"""
+Concurrent execution helpers for the claims agent.
+
+- TokenBucket: client-side rate limit for LLM calls (requests per second).
+- call_with_retry: retries transient failures (timeouts, 429, 5xx) with
+  exponential backoff and jitter, honouring Retry-After when present.
+- imap_completed / run_batch: run a function over many records on a
+  bounded thread pool, either as results complete or in input order.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for errors worth retrying: timeouts, connection drops, throttling and 5xx."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        # httpx.HTTPStatusError and similar carry the status on their response
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return any(marker in name for marker in ("Timeout", "Connect", "RateLimit"))
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    retries: int = 4,
+    backoff: float = 1.0,
+    max_backoff: float = 30.0,
+    retry_if: Callable[[BaseException], bool] = is_transient,
+    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+) -> Any:
+    """Call `fn`, retrying transient failures with exponential backoff and jitter.
+
+    `on_retry(attempt, exc, delay)` is called before each retry, e.g. to count them.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not retry_if(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = min(max_backoff, backoff * (2 ** attempt)) * (0.5 + random.random() / 2)
+            attempt += 1
+            log.warning(f"🔁 Retry {attempt}/{retries} in {delay:.1f}s after {type(e).__name__}: {e}")
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
+
+
+def imap_completed(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = 8,
+) -> Iterator[Tuple[int, Any, Any]]:
+    """Yield (index, item, fn(item)) as each call finishes.
+
+    At most 2 * max_workers items are in flight, so `items` may be a lazy
+    iterator over an arbitrarily large input. Exceptions raised by `fn`
+    propagate; wrap `fn` if per-item errors should be recorded instead.
+    """
+    items = iter(items)
+    pending = {}
+    index = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while len(pending) < 2 * max_workers:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                pending[pool.submit(fn, item)] = (index, item)
+                index += 1
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, item = pending.pop(future)
+                yield i, item, future.result()
+
+
+def imap_ordered(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = 8,
+) -> Iterator[Any]:
+    """Like imap_completed, but yields bare results in input order."""
+    buffered = {}
+    next_index = 0
+    for i, _, result in imap_completed(fn, items, max_workers=max_workers):
+        buffered[i] = result
+        while next_index in buffered:
+            yield buffered.pop(next_index)
+            next_index += 1
+
+
+def run_batch(fn: Callable[[Any], Any], items: Iterable[Any], max_workers: int = 8) -> List[Any]:
+    """Run `fn` over `items` concurrently and return the results in input order."""
+    return list(imap_ordered(fn, items, max_workers=max_workers))
@@ -0,0 +1,120 @@
+"""
+Scoring the claims agent against labelled records (VALIDATION).
+
+parse_decision() pulls the decision out of a '- Decision: ...' response;
+score() compares those with each record's expected decision and reports
+accuracy, a confusion matrix and per-label precision/recall. Modes are
+named like "chain", "structured" or "rules+chain" (rule fast path first).
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from claims_rules import APPROVE, ROUTE_FOR_REVIEW
+
+UNPARSED = "UNPARSED"
+LABELS = [APPROVE, ROUTE_FOR_REVIEW, UNPARSED]
+
+# where labelled record files keep the expected outcome
+GROUND_TRUTH_FIELDS = ("expected_decision", "ground_truth", "reference_response", "expected_response",
+                       "decision", "label")
+
+_DECISION = re.compile(r"decision\W*(approve|route\s+for\s+review)", re.IGNORECASE)
+_BARE = re.compile(r"^\W*(approve|route\s+for\s+review)\W*$", re.IGNORECASE)
+
+
+def parse_decision(text: Any) -> str:
+    """APPROVE, ROUTE FOR REVIEW, or UNPARSED when the text has no recognisable decision."""
+    if not isinstance(text, str):
+        return UNPARSED
+    match = _DECISION.search(text) or _BARE.match(text)
+    if match is None:
+        return UNPARSED
+    return " ".join(match.group(1).upper().split())
+
+
+def expected_decision(record: Dict[str, Any]) -> Optional[str]:
+    for name in GROUND_TRUTH_FIELDS:
+        value = record.get(name)
+        if value:
+            decision = parse_decision(value)
+            if decision != UNPARSED:
+                return decision
+    return None
+
+
+def parse_modes(spec: str) -> List[Tuple[str, str, bool]]:
+    """'chain,rules+structured' -> [(name, mode, rule_fast_path), ...]."""
+    modes = []
+    for name in (m.strip() for m in spec.split(",")):
+        if not name:
+            continue
+        rules, _, mode = name.rpartition("+")
+        if mode not in ("chain", "structured") or rules not in ("", "rules"):
+            raise ValueError(f"Unknown evaluation mode {name!r}; use [rules+]chain or [rules+]structured")
+        modes.append((name, mode, rules == "rules"))
+    return modes
+
+
+def predictions(records: Iterable[Dict[str, Any]], responses: Dict[Any, str]) -> pd.DataFrame:
+    """One row per record: patient_id, expected, predicted and the raw response."""
+    rows = []
+    for record in records:
+        response = responses.get(record["patient_id"])
+        rows.append({
+            "patient_id": record["patient_id"],
+            "expected": expected_decision(record),
+            "predicted": parse_decision(response),
+            "response": response,
+        })
+    return pd.DataFrame(rows, columns=["patient_id", "expected", "predicted", "response"])
+
+
+def score(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Accuracy, confusion matrix (expected x predicted) and per-label precision/recall."""
+    labelled = frame[frame["expected"].notna()]
+    confusion = (pd.crosstab(pd.Categorical(labelled["expected"], categories=LABELS[:2]),
+                             pd.Categorical(labelled["predicted"], categories=LABELS), dropna=False)
+                 .reindex(index=LABELS[:2], columns=LABELS, fill_value=0))
+    per_label = {}
+    for label in LABELS[:2]:
+        true_positive = int(confusion.loc[label, label])
+        predicted = int(confusion[label].sum())
+        actual = int(confusion.loc[label].sum())
+        per_label[label] = {
+            "precision": round(true_positive / predicted, 4) if predicted else None,
+            "recall": round(true_positive / actual, 4) if actual else None,
+            "support": actual,
+        }
+    correct = int((labelled["expected"] == labelled["predicted"]).sum())
+    return {
+        "claims": len(frame),
+        "labelled": len(labelled),
+        "accuracy": round(correct / len(labelled), 4) if len(labelled) else None,
+        "unparsed": int((frame["predicted"] == UNPARSED).sum()),
+        "confusion_matrix": {label: {k: int(v) for k, v in row.items()} for label, row in confusion.iterrows()},
+        "per_label": per_label,
+    }
+
+
+def format_report(reports: Dict[str, Dict[str, Any]]) -> str:
+    """One line per mode: accuracy, latency, tokens and cache hits."""
+    lines = [f"{'mode':<20} {'accuracy':>8} {'labelled':>8} {'unparsed':>8} {'p50 s':>8} {'p95 s':>8} "
+             f"{'tok/claim':>9} {'cached':>6}"]
+    for name, report in reports.items():
+        run = report["trace"]["run"]
+        claim = next((s for s in report["trace"]["stages"]
+                      if s["stage"] in ("claim", "structured_request")), {})
+        accuracy = report["score"]["accuracy"]
+
+        def seconds(value):
+            return f"{value:8.2f}" if value is not None else f"{'-':>8}"
+
+        lines.append(f"{name:<20} {accuracy if accuracy is not None else '-':>8} "
+                     f"{report['score']['labelled']:>8} {report['score']['unparsed']:>8} "
+                     f"{seconds(claim.get('p50_seconds'))} {seconds(claim.get('p95_seconds'))} "
+                     f"{run['tokens_per_claim'] if run['tokens_per_claim'] is not None else '-':>9} "
+                     f"{run['cache_hits']:>6}")
+    return "\n".join(lines)
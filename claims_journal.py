@@ -0,0 +1,151 @@
+"""
+Append-only JSON Lines journal of finished claims.
+
+Each result is written (and flushed) as soon as it completes, so a
+crash or throttling storm loses nothing already paid for; fsync runs at
+most every `sync_interval` seconds and on sync(), which the agent calls
+once per chunk. On restart the journal is replayed: claims recorded
+without error are skipped, failed ones are retried, and their answers
+are read back from the file as the submission is composed in input
+order. With path=None the journal is kept in memory only (e.g. for
+evaluation runs).
+
+The first line records the run settings (input file, mode, rules,
+model). A journal written with other settings is not resumed: its
+answers would not be what this run asks for.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class JournalMismatch(ValueError):
+    """The journal on disk was written by a run with different settings."""
+
+
+class Journal:
+    """
+    Durable record of processed claims keyed by patient_id (latest entry wins).
+
+    Only the status of each claim and the file offset of its line are kept
+    in memory; response() reads a journaled answer back from disk. An
+    in-memory journal (path=None) keeps the responses themselves.
+    """
+
+    def __init__(self, path: Optional[str], resume: bool = True, run: Optional[Dict[str, Any]] = None,
+                 sync_interval: float = 1.0):
+        self.path = path
+        self.run = dict(run or {})
+        self.sync_interval = sync_interval
+        # patient_id -> (failed, offset of its line, or the response itself when path is None)
+        self._entries: Dict[Any, Tuple[bool, Any]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._reader = None
+        self._size = 0
+        self._unsynced = False
+        self._synced_at = time.monotonic()
+        if path is None:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        has_header = resume and os.path.exists(path) and self._replay()
+        self._file = open(path, "ab" if resume else "wb")
+        self._size = self._file.tell()
+        if not has_header:
+            self._write({"run": self.run})
+            self._sync()
+
+    def _replay(self) -> bool:
+        """Index the entries of an existing journal; False if it is empty."""
+        header, offset, partial = None, 0, False
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    partial = True
+                    break
+                if line.strip():
+                    entry = json.loads(line)
+                    if header is None:
+                        header = entry.get("run") if "patient_id" not in entry else None
+                        if header != self.run:
+                            raise JournalMismatch(
+                                f"{self.path} was written with {header or 'unrecorded settings'}, "
+                                f"not {self.run}; rerun with --fresh, or pass another --journal")
+                    else:
+                        self._entries[entry["patient_id"]] = (entry.get("failed", False), offset)
+                offset += len(line)
+        if partial:
+            # a crash mid-write left a partial last line; drop it
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+        return header is not None
+
+    def _write(self, entry: Dict[str, Any]) -> int:
+        """Append one line; returns its offset."""
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self._size
+        self._file.write(line)
+        self._file.flush()
+        self._size += len(line)
+        self._unsynced = True
+        return offset
+
+    def __contains__(self, patient_id: Any) -> bool:
+        """True if the claim finished without error in this or an earlier run."""
+        entry = self._entries.get(patient_id)
+        return entry is not None and not entry[0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, patient_id: Any, response: str, failed: bool = False) -> None:
+        with self._lock:
+            if self._file is None:
+                self._entries[patient_id] = (failed, response)
+                return
+            offset = self._write({"patient_id": patient_id, "generated_response": response, "failed": failed})
+            if time.monotonic() - self._synced_at >= self.sync_interval:
+                self._sync()
+            self._entries[patient_id] = (failed, offset)
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._unsynced = False
+        self._synced_at = time.monotonic()
+
+    def sync(self) -> None:
+        """fsync what was appended since the last sync."""
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._sync()
+
+    def response(self, patient_id: Any) -> str:
+        """The latest journaled response of a claim."""
+        with self._lock:
+            _, value = self._entries[patient_id]
+            if self.path is None:
+                return value
+            if self._reader is None:
+                self._reader = open(self.path, "rb")
+            self._reader.seek(value)
+            return json.loads(self._reader.readline())["generated_response"]
+
+    def responses(self) -> Dict[Any, str]:
+        """Every journaled response; meant for in-memory journals (e.g. evaluation runs)."""
+        return {pid: self.response(pid) for pid in list(self._entries)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                if self._unsynced:
+                    self._sync()
+                self._file.close()
+                self._file = None
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
@@ -0,0 +1,227 @@
+"""
+LLM backends for the claims agent.
+
+Every backend exposes complete(messages, temperature, timeout=None,
+**params) -> Completion, so the agent does not care whether it talks to:
+
+- AzureBackend: the Azure OpenAI deployment (openai.AzureOpenAI);
+- FakeBackend: a local, deterministic stand-in with configurable latency,
+  error rate and throttling, for offline runs, CI and load tests.
+
+make_backend() picks one from CLAIMS_LLM_BACKEND ("azure" or "fake").
+ResponseCache memoises completions by model, messages and sampling
+parameters, so identical prompts are answered locally across runs.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from claims_cache import MemoCache, content_hash, make_key
+
+
+class Completion(NamedTuple):
+    content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model: str = ""
+    cached: bool = False
+
+
+class AzureBackend:
+    """Azure OpenAI chat completions for one deployment."""
+
+    def __init__(self, endpoint: str, deployment: str, api_version: str, project_id: Optional[str] = None,
+                 azure_ad_token: Optional[str] = None,
+                 azure_ad_token_provider: Optional[Callable[[], str]] = None):
+        from openai import AzureOpenAI
+
+        self.model = deployment
+        self.client = AzureOpenAI(
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            azure_deployment=deployment,
+            azure_ad_token=azure_ad_token,
+            azure_ad_token_provider=azure_ad_token_provider,
+            default_headers={"projectId": project_id} if project_id else None,
+            # call_with_retry retries, through the rate limiter; the SDK must not retry on its own
+            max_retries=0,
+        )
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None,
+                 **params) -> Completion:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout,
+            **params,
+        )
+        usage = response.usage
+        return Completion(
+            content=response.choices[0].message.content,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            model=response.model or self.model,
+        )
+
+
+class FakeResponse:
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = headers
+
+
+class FakeAPIError(Exception):
+    """Server-side failure from FakeBackend; shaped like an openai APIStatusError."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = FakeResponse({"retry-after": str(retry_after)} if retry_after is not None else {})
+
+
+# latency in seconds per request (mean, jitter), error_rate and throttle_rate
+# as fractions of requests, max_concurrency as the server's in-flight limit
+PROFILES = {
+    "instant": dict(latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, max_concurrency=None),
+    "realistic": dict(latency=1.5, jitter=0.5, error_rate=0.0, throttle_rate=0.0, max_concurrency=None),
+    "flaky": dict(latency=1.5, jitter=1.0, error_rate=0.05, throttle_rate=0.0, max_concurrency=None),
+    "throttled": dict(latency=1.5, jitter=0.5, error_rate=0.0, throttle_rate=0.1, max_concurrency=8),
+}
+
+
+def _digest(messages: List[Dict[str, str]]) -> int:
+    text = json.dumps(messages, sort_keys=True)
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def template_response(messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """
+    Deterministic canned answer shaped like the real one for each prompt kind:
+    structured decisions, '- Decision / - Reason' checks, or bullet summaries.
+    """
+    prompt = messages[-1]["content"]
+    decisions = ("APPROVE", "ROUTE FOR REVIEW")
+    if "response_format" in params:
+        claims = json.loads(prompt.rsplit("Claims:\n", 1)[1])
+        return json.dumps({"claims": [
+            {"patient_id": str(c.get("patient_id")),
+             "decision": decisions[_digest([c]) % 2],
+             "reason": "Offline stand-in decision.",
+             "matched_codes": []}
+            for c in claims]})
+    if "Decision:" in prompt:
+        return f"- Decision: {decisions[_digest(messages) % 2]}\n- Reason: Offline stand-in decision."
+    codes = sorted(set(re.findall(r"\b[A-Z]\d{2}(?:\.\d+)?\b|\b\d{5}\b", prompt)))
+    return "- Summary: offline stand-in\n" + "".join(f"- Code: {c}\n" for c in codes)
+
+
+class FakeBackend:
+    """
+    Local stand-in for the chat endpoint. Responses come from `responder`
+    (template_response by default) after a simulated latency; a fraction of
+    requests fail with 500 or are throttled with 429 + Retry-After, as are
+    requests beyond `max_concurrency` in flight. Seeded, so runs repeat.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, max_concurrency: Optional[int] = None, retry_after: float = 1.0,
+                 responder: Callable[[List[Dict[str, str]], Dict[str, Any]], str] = template_response,
+                 seed: int = 0, model: str = "fake"):
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.responder = responder
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_profile(cls, name: str, **overrides) -> "FakeBackend":
+        if name not in PROFILES:
+            raise ValueError(f"Unknown fake LLM profile {name!r}; choose from {sorted(PROFILES)}")
+        return cls(**dict(PROFILES[name], **overrides))
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None,
+                 **params) -> Completion:
+        with self._lock:
+            self.calls += 1
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            busy = self.max_concurrency is not None and self._in_flight >= self.max_concurrency
+            if busy or roll < self.throttle_rate:
+                self.throttled += 1
+                raise FakeAPIError(429, "Rate limit exceeded (fake)", retry_after=self.retry_after)
+            self._in_flight += 1
+        try:
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"Request timed out after {timeout}s (fake)")
+            time.sleep(delay)
+            if roll > 1.0 - self.error_rate:
+                with self._lock:
+                    self.errors += 1
+                raise FakeAPIError(500, "Internal server error (fake)")
+            content = self.responder(messages, params)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        return Completion(content, prompt_tokens=prompt_chars // 4 + 1, completion_tokens=len(content) // 4 + 1,
+                          model=self.model)
+
+
+def make_backend(name: Optional[str] = None, **azure_options) -> Any:
+    """
+    Backend named by `name` or CLAIMS_LLM_BACKEND: "fake" (profile from
+    FAKE_LLM_PROFILE, default "realistic") or "azure" (built from `azure_options`).
+    """
+    name = name or os.getenv("CLAIMS_LLM_BACKEND", "azure")
+    if name == "fake":
+        return FakeBackend.from_profile(os.getenv("FAKE_LLM_PROFILE", "realistic"),
+                                        seed=int(os.getenv("FAKE_LLM_SEED", "0")))
+    if name == "azure":
+        return AzureBackend(**azure_options)
+    raise ValueError(f"Unknown LLM backend {name!r}; expected 'azure' or 'fake'")
+
+
+class ResponseCache:
+    """
+    Content-addressed completion cache: the key is the model, the exact
+    messages and the sampling parameters. Backed by a MemoCache, so hits
+    survive between runs, the store is capped at `max_bytes` (least
+    recently used evicted first) and entries can expire after `ttl` seconds.
+    """
+
+    def __init__(self, path: Optional[str], max_bytes: Optional[int] = None, ttl: Optional[float] = None,
+                 max_items: int = 1024):
+        self.memo = MemoCache(path, max_items=max_items, namespace="llm_response", max_bytes=max_bytes, ttl=ttl)
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, params: Dict[str, Any],
+                 send: Callable[[], Completion]) -> Completion:
+        """Return the cached completion for this request, or call `send` and cache its result."""
+        key = make_key(model, content_hash(messages), temperature, content_hash(params))
+        computed = []
+
+        def compute():
+            completion = send()
+            computed.append(True)
+            return completion._asdict()
+
+        completion = Completion(**self.memo.get_or_compute(key, compute))
+        return completion if computed else completion._replace(cached=True)
+
+    def close(self) -> None:
+        self.memo.close()
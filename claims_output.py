@@ -0,0 +1,137 @@
+"""
+Post-processing and writing of the submission.
+
+Each response is handled once, as it arrives: whitespace is normalised
+in a single compiled pass (optionally) and the Decision/Reason lines are
+parsed into their own columns. SubmissionWriter keeps rows in input
+order -- finished claims are written as soon as every claim before them
+is done -- to the two-column submission CSV and, optionally, to a
+Parquet file that also carries the parsed columns. Rows are dropped once
+written, so memory holds only claims waiting for an earlier one.
+"""
+
+import collections
+import csv
+import os
+import re
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from claims_eval import parse_decision
+
+SUBMISSION_COLUMNS = ["patient_id", "generated_response"]
+COLUMNS = SUBMISSION_COLUMNS + ["decision", "reason"]
+
+# literal "\n" sequences left in model output count as whitespace too
+_WHITESPACE = re.compile(r"(?:\\n|\s)+")
+_REASON = re.compile(r"reason\W*(.*)", re.IGNORECASE | re.DOTALL)
+
+
+def clean_response(text: Any) -> str:
+    """Collapse newlines and runs of whitespace into single spaces."""
+    return _WHITESPACE.sub(" ", str(text)).strip()
+
+
+def parse_fields(text: Any) -> Tuple[str, Optional[str]]:
+    """(decision, reason) of a '- Decision: ...\\n- Reason: ...' response."""
+    match = _REASON.search(text) if isinstance(text, str) else None
+    reason = clean_response(match.group(1)) if match else None
+    return parse_decision(text), reason or None
+
+
+def _prepare(path: str) -> str:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return path
+
+
+class SubmissionWriter:
+    """
+    Streams submission rows to `csv_path` (and `parquet_path` if given) in
+    the order claims are expect()ed, whatever order they finish in.
+    """
+
+    def __init__(self, csv_path: str, parquet_path: Optional[str] = None, clean: bool = False,
+                 row_group_size: int = 10000):
+        self.clean = clean
+        self.row_group_size = row_group_size
+        self.written = 0
+        self._order: Deque[Any] = collections.deque()  # expected claims not yet written
+        self._rows: Dict[Any, Dict[str, Any]] = {}  # finished claims waiting for earlier ones
+        self._pending: List[Dict[str, Any]] = []  # rows not yet in a Parquet row group
+        self._parquet = None
+        if parquet_path:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self._schema = pa.schema([(name, pa.string()) for name in COLUMNS])
+            self._parquet = pq.ParquetWriter(_prepare(parquet_path), self._schema)
+        self._file = open(_prepare(csv_path), "w", encoding="utf-8", newline="")
+        self._csv = csv.writer(self._file, lineterminator="\n")
+        self._csv.writerow(SUBMISSION_COLUMNS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # after a failure keep what was written; the journal has the rest
+        self.close(check_complete=exc_type is None)
+
+    def expect(self, patient_ids: Iterable[Any]) -> None:
+        """Append claims to the output order as they are read."""
+        self._order.extend(patient_ids)
+        self._drain()
+
+    def add(self, patient_id: Any, response: str) -> None:
+        """Record a finished claim; writes it once the claims before it are done."""
+        if self.clean:
+            response = clean_response(response)
+        decision, reason = parse_fields(response)
+        self._rows[patient_id] = {"patient_id": patient_id, "generated_response": response,
+                                  "decision": decision, "reason": reason}
+        self._drain()
+
+    def _drain(self) -> None:
+        ready = []
+        while self._order and self._order[0] in self._rows:
+            ready.append(self._rows.pop(self._order.popleft()))
+        if not ready:
+            return
+        self.written += len(ready)
+        self._csv.writerows([row["patient_id"], row["generated_response"]] for row in ready)
+        self._file.flush()
+        if self._parquet is not None:
+            self._pending.extend(ready)
+            if len(self._pending) >= self.row_group_size:
+                self._write_row_group()
+
+    def _write_row_group(self) -> None:
+        import pyarrow as pa
+
+        columns = {name: [None if row[name] is None else str(row[name]) for row in self._pending]
+                   for name in COLUMNS}
+        self._parquet.write_table(pa.Table.from_pydict(columns, schema=self._schema))
+        self._pending = []
+
+    def close(self, check_complete: bool = True) -> None:
+        if self._parquet is not None:
+            if self._pending:
+                self._write_row_group()
+            self._parquet.close()
+            self._parquet = None
+        if not self._file.closed:
+            self._file.close()
+        missing = len(self._order)
+        if check_complete and missing:
+            raise RuntimeError(f"{missing} claims have no response; the submission is incomplete")
+
+
+def preview(frame, rows: int = 10, width: int = 80) -> str:
+    """The first `rows` rows with long responses shortened, instead of the whole frame."""
+    import pandas as pd
+
+    with pd.option_context("display.expand_frame_repr", False):
+        text = frame.head(rows).to_string(index=False, max_colwidth=width)
+    if len(frame) > rows:
+        text += f"\n... {len(frame) - rows} more rows"
+    return text
@@ -0,0 +1,153 @@
+"""
+Prompt sizing: compact serialisation, local token counts and budgets.
+
+Documents go into prompts as compact JSON (no indentation or spaces after
+separators). count_tokens() uses a characters/4 estimate unless
+CLAIMS_TOKENIZER=tiktoken opts into exact counts; tiktoken downloads its
+encoding file (without a timeout) on first use unless it is already in
+TIKTOKEN_CACHE_DIR, so only enable it where that file is cached or the
+endpoint is reachable. fit_document() shrinks a
+record or policy until its rendered prompt fits a token budget: first by
+dropping fields the prompt does not ask about, then by shortening free
+text. Codes, coverage lists and the other fields decisions depend on are
+never cut; if the prompt still does not fit it is sent whole, with a
+warning.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+
+from claims_rules import PROCEDURE_FIELDS, RECORD_FIELDS
+
+log = logging.getLogger("claims_agent")
+
+# "estimate" (no dependencies, no I/O) or "tiktoken"
+TOKENIZER = os.getenv("CLAIMS_TOKENIZER", "estimate")
+# encoding for model names tiktoken does not know (e.g. Azure deployment names)
+DEFAULT_ENCODING = os.getenv("TIKTOKEN_ENCODING", "o200k_base")
+# chat format overhead per message (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# fields the summary prompts ask for; fit_document drops the rest first
+RECORD_PROMPT_FIELDS = frozenset(
+    [name for names in RECORD_FIELDS.values() for name in names]
+    + ["patient_id", "name", "date_of_service", "service_date"])
+POLICY_PROMPT_FIELDS = frozenset(
+    [name for names in PROCEDURE_FIELDS.values() for name in names]
+    + ["policy_id", "insurance_policy_id", "plan_name", "covered_procedures", "coverage_limit",
+       "max_coverage_amount", "annual_limit", "description", "notes"])
+
+# fields coverage decisions depend on (codes, covered_procedures, limits, ...); never shortened
+DECISION_FIELDS = frozenset(
+    [name for names in RECORD_FIELDS.values() for name in names]
+    + [name for names in PROCEDURE_FIELDS.values() for name in names]
+    + ["patient_id", "policy_id", "insurance_policy_id", "covered_procedures", "coverage_limit",
+       "max_coverage_amount", "annual_limit", "date_of_service", "service_date"])
+
+_STRING_LIMITS = (200, 80)
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=dict)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English and JSON)."""
+    return len(text) // 4 + 1
+
+
+_encodings: Dict[Optional[str], Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _load_encoding(model: Optional[str]):
+    try:
+        import tiktoken
+    except ImportError:
+        log.warning("⚠️ CLAIMS_TOKENIZER=tiktoken but tiktoken is not installed; estimating token counts.")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:  # encoding file neither cached nor downloadable
+        log.warning(f"⚠️ tiktoken encoding unavailable ({e}); estimating token counts.")
+        return None
+
+
+def _encoding(model: Optional[str]):
+    if TOKENIZER != "tiktoken":
+        return None
+    if model not in _encodings:
+        # one thread loads (and possibly downloads) the encoding; the others wait for it
+        with _encodings_lock:
+            if model not in _encodings:
+                _encodings[model] = _load_encoding(model)
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    return sum(count_tokens(m["content"], model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _select_fields(value: Any, keep: Collection[str]) -> Any:
+    if isinstance(value, Mapping):
+        return {k: _select_fields(v, keep) for k, v in value.items() if k in keep}
+    if isinstance(value, list):
+        return [_select_fields(v, keep) for v in value]
+    return value
+
+
+def _shorten_text(value: Any, limit: int, protected: bool = False) -> Any:
+    """Shorten strings longer than `limit`, except values (and code lists) of DECISION_FIELDS."""
+    if isinstance(value, Mapping):
+        return {k: _shorten_text(v, limit, k in DECISION_FIELDS) for k, v in value.items()}
+    if isinstance(value, list):
+        # lists of documents (covered_procedures) have their own free text; code lists stay whole
+        return [_shorten_text(v, limit, protected) for v in value]
+    if isinstance(value, str) and len(value) > limit and not protected:
+        return value[:limit] + "..."
+    return value
+
+
+def fit_document(document: Any, render: Callable[[Any], str], budget: int, model: Optional[str] = None,
+                 keep: Optional[Collection[str]] = None) -> Tuple[str, int, bool]:
+    """
+    render(document) shrunk until it fits `budget` tokens (budget <= 0: no limit),
+    by dropping fields outside `keep` and shortening free text. Returns
+    (prompt, tokens, trimmed); if nothing fits, the untrimmed prompt.
+    """
+    prompt = render(document)
+    tokens = count_tokens(prompt, model)
+    if budget <= 0 or tokens <= budget:
+        return prompt, tokens, False
+
+    def candidates():
+        current = _select_fields(document, keep) if keep else document
+        if keep:
+            yield current
+        for limit in _STRING_LIMITS:
+            current = _shorten_text(current, limit)
+            yield current
+
+    for candidate in candidates():
+        trimmed_prompt = render(candidate)
+        trimmed_tokens = count_tokens(trimmed_prompt, model)
+        if trimmed_tokens <= budget:
+            return trimmed_prompt, trimmed_tokens, True
+    # partial trimming would lose detail without meeting the budget anyway
+    log.warning(f"⚠️ Prompt has {tokens} tokens, over the {budget}-token budget even with free text "
+                f"shortened; sending it untrimmed.")
+    return prompt, tokens, False
@@ -0,0 +1,307 @@
+"""
+Deterministic coverage rules evaluated over all claims at once.
+
+Every claim is checked against the structured fields of its policy:
+procedure covered, diagnosis match, age range, gender restriction,
+preauthorization and billed amount vs. coverage limit. Claims that pass
+every check are APPROVEd, claims that clearly fail one are ROUTEd FOR
+REVIEW, and claims missing the data to decide (decision None) are left
+for the LLM chain. So are claims whose policy states an age range or
+coverage limit the rules cannot read (e.g. "65 and older"): a restriction
+that is present but unparsed is never treated as no restriction.
+
+Field names follow insurance_policies.json / *_records.json; the
+aliases below cover the spellings seen across data drops.
+"""
+
+import math
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from claims_data import code_text
+
+APPROVE = "APPROVE"
+ROUTE_FOR_REVIEW = "ROUTE FOR REVIEW"
+
+RECORD_FIELDS = {
+    "policy_id": ("insurance_policy_id", "policy_id"),
+    "age": ("age", "patient_age"),
+    "gender": ("gender", "sex"),
+    "diagnosis_codes": ("diagnosis_codes", "icd10_codes"),
+    "procedure_codes": ("procedure_codes", "cpt_codes"),
+    "preauthorization": ("preauthorization_obtained", "preauthorization_status", "preauth_obtained"),
+    "billed_amount": ("billed_amount", "amount_billed"),
+}
+
+PROCEDURE_FIELDS = {
+    "procedure_code": ("procedure_code", "cpt_code", "code"),
+    "diagnoses": ("covered_diagnoses", "diagnosis_codes", "icd10_codes"),
+    "age_range": ("age_range",),
+    "gender": ("gender_restriction", "gender"),
+    "preauthorization": ("requires_preauthorization", "preauthorization_required"),
+    "coverage_limit": ("coverage_limit", "max_coverage_amount", "coverage_amount"),
+}
+
+POLICY_LIMIT_FIELDS = ("coverage_limit", "max_coverage_amount", "annual_limit")
+
+_ANY_GENDER = {"", "ANY", "ALL", "BOTH", "NONE", "N/A"}
+
+# "$5,000", "5000 USD", "USD 5,000.00"
+_AMOUNT_NOISE = re.compile(r"[\s,$]|usd", re.IGNORECASE)
+# "18-64", "18 - 64", "18 to 64"; "65+"
+_AGE_RANGE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+_AGE_FROM = re.compile(r"(\d+(?:\.\d+)?)\s*\+")
+
+
+def field(document: Dict[str, Any], names: Iterable[str]) -> Any:
+    """The first non-null value among the alias `names` (see RECORD_FIELDS / PROCEDURE_FIELDS)."""
+    for name in names:
+        if name in document and document[name] is not None:
+            return document[name]
+    return None
+
+
+def as_list(value: Any) -> List[str]:
+    """Codes from a list, a comma-separated string or a single (possibly numeric) code."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [code for code in (code_text(v) for v in value) if code]
+
+
+def _as_bool(value: Any) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "y", "1", "obtained", "approved"):
+        return True
+    if text in ("false", "no", "n", "0", "not obtained", "none", "pending", "denied"):
+        return False
+    return None
+
+
+def _gender(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip().upper()
+    if text in _ANY_GENDER:
+        return "ANY"
+    return text[0] if text[0] in "MF" else text
+
+
+def _record_gender(record: Dict[str, Any]) -> Optional[str]:
+    gender = _gender(field(record, RECORD_FIELDS["gender"]))
+    return None if gender == "ANY" else gender
+
+
+def _number(value: Any) -> Optional[float]:
+    """A number, or a numeric string with currency noise ("$5,000", "5000 USD"); None if neither."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, np.number)):
+        number = float(value)
+    else:
+        try:
+            number = float(_AMOUNT_NOISE.sub("", str(value)))
+        except ValueError:
+            return None
+    return None if math.isnan(number) else number
+
+
+def _bounds(low: Any, high: Any) -> Tuple[Optional[float], Optional[float], bool]:
+    parsed_low, parsed_high = _number(low), _number(high)
+    readable = (low is None or parsed_low is not None) and (high is None or parsed_high is not None)
+    return parsed_low, parsed_high, readable
+
+
+def _age_bounds(procedure: Dict[str, Any]) -> Tuple[Optional[float], Optional[float], bool]:
+    """(min, max, readable); a missing bound is None, readable is False for an unparsed range."""
+    value = field(procedure, PROCEDURE_FIELDS["age_range"])
+    if value is None:
+        return _bounds(procedure.get("min_age"), procedure.get("max_age"))
+    if isinstance(value, dict):
+        return _bounds(value.get("min"), value.get("max"))
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return _bounds(value[0], value[1])
+    if isinstance(value, str):
+        text = value.strip()
+        match = _AGE_RANGE.fullmatch(text)
+        if match:
+            return _bounds(match.group(1), match.group(2))
+        match = _AGE_FROM.fullmatch(text)
+        if match:
+            return _bounds(match.group(1), None)
+        if text.endswith("-"):  # "65-"
+            return _bounds(text[:-1], None)
+    return None, None, False
+
+
+class PolicyTables(NamedTuple):
+    """Policies flattened for evaluate_claims; build once per policy index with policy_tables()."""
+    procedures: pd.DataFrame  # one row per (policy, procedure)
+    diagnoses: pd.DataFrame  # one row per (policy, procedure, covered diagnosis)
+    policy_ids: FrozenSet[str]
+
+
+def policy_tables(policy_index: Dict[str, Dict[str, Any]]) -> PolicyTables:
+    """Flatten policies into (policy, procedure) and (policy, procedure, diagnosis) tables."""
+    procedures, diagnoses = [], []
+    for policy_id, policy in policy_index.items():
+        policy_limit = field(policy, POLICY_LIMIT_FIELDS)
+        for procedure in policy.get("covered_procedures", []):
+            code = code_text(field(procedure, PROCEDURE_FIELDS["procedure_code"]))
+            low, high, age_readable = _age_bounds(procedure)
+            limit = field(procedure, PROCEDURE_FIELDS["coverage_limit"])
+            if limit is None:
+                limit = policy_limit
+            coverage_limit = _number(limit)
+            covered_diagnoses = as_list(field(procedure, PROCEDURE_FIELDS["diagnoses"]))
+            procedures.append({
+                "policy_id": policy_id,
+                "procedure_code": code,
+                "age_min": low,
+                "age_max": high,
+                "gender_restriction": _gender(field(procedure, PROCEDURE_FIELDS["gender"])) or "ANY",
+                "requires_preauth": _as_bool(field(procedure, PROCEDURE_FIELDS["preauthorization"])),
+                "coverage_limit": coverage_limit,
+                # a procedure without a diagnosis list is covered for any diagnosis
+                "diagnosis_restricted": bool(covered_diagnoses),
+                # stated but unparsed: the rules cannot decide, the claim goes to the LLM
+                "unreadable": not age_readable or (limit is not None and coverage_limit is None),
+            })
+            for diagnosis in covered_diagnoses:
+                diagnoses.append({"policy_id": policy_id, "procedure_code": code, "diagnosis_code": diagnosis})
+    procedures = pd.DataFrame(procedures, columns=[
+        "policy_id", "procedure_code", "age_min", "age_max", "gender_restriction",
+        "requires_preauth", "coverage_limit", "diagnosis_restricted", "unreadable"])
+    diagnoses = pd.DataFrame(diagnoses, columns=["policy_id", "procedure_code", "diagnosis_code"])
+    for column in ("age_min", "age_max", "coverage_limit"):
+        procedures[column] = procedures[column].astype(float)
+    return PolicyTables(procedures.drop_duplicates(["policy_id", "procedure_code"]),
+                        diagnoses.drop_duplicates(), frozenset(policy_index))
+
+
+def _claim_table(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    claims = pd.DataFrame({
+        "policy_id": [field(r, RECORD_FIELDS["policy_id"]) for r in records],
+        "age": pd.to_numeric(pd.Series([field(r, RECORD_FIELDS["age"]) for r in records], dtype=object),
+                             errors="coerce"),
+        "gender": [_record_gender(r) for r in records],
+        "preauth_obtained": [_as_bool(field(r, RECORD_FIELDS["preauthorization"])) for r in records],
+        "billed_amount": pd.to_numeric(
+            pd.Series([field(r, RECORD_FIELDS["billed_amount"]) for r in records], dtype=object),
+            errors="coerce"),
+        "procedure_codes": [as_list(field(r, RECORD_FIELDS["procedure_codes"])) for r in records],
+        "diagnosis_codes": [as_list(field(r, RECORD_FIELDS["diagnosis_codes"])) for r in records],
+    })
+    claims.index.name = "claim"
+    return claims
+
+
+def evaluate_claims(records: List[Dict[str, Any]],
+                    policies: Union[PolicyTables, Dict[str, Dict[str, Any]]]) -> pd.DataFrame:
+    """
+    Apply the hard coverage rules to every record.
+
+    `policies` is a policy index or, to avoid flattening it again on
+    every call, its policy_tables(). Returns a frame aligned with
+    `records` with columns `decision` (APPROVE, ROUTE FOR REVIEW or
+    None when the rules cannot decide) and `reason`.
+    """
+    if not isinstance(policies, PolicyTables):
+        policies = policy_tables(policies)
+    records = list(records)
+    claims = _claim_table(records)
+    procedures, diagnoses = policies.procedures, policies.diagnoses
+
+    # one row per (claim, billed procedure), joined to the policy's coverage entry
+    lines = claims[["policy_id", "procedure_codes"]].explode("procedure_codes").reset_index()
+    lines = lines.rename(columns={"procedure_codes": "procedure_code"}).dropna(subset=["procedure_code"])
+    lines = lines.merge(procedures, on=["policy_id", "procedure_code"], how="left", indicator="covered")
+    lines["covered"] = lines["covered"] == "both"
+    lines = lines.join(claims[["age", "gender", "preauth_obtained", "billed_amount"]], on="claim")
+
+    # a line's diagnosis matches if any of the claim's diagnoses is covered for that procedure
+    claim_diagnoses = claims[["diagnosis_codes"]].explode("diagnosis_codes").reset_index()
+    claim_diagnoses = claim_diagnoses.rename(columns={"diagnosis_codes": "diagnosis_code"}).dropna()
+    matched = (lines[["claim", "policy_id", "procedure_code"]]
+               .merge(claim_diagnoses, on="claim")
+               .merge(diagnoses, on=["policy_id", "procedure_code", "diagnosis_code"])
+               [["claim", "procedure_code"]].drop_duplicates())
+    matched["diagnosis_match"] = True
+    lines = lines.merge(matched, on=["claim", "procedure_code"], how="left")
+    lines["diagnosis_match"] = lines["diagnosis_match"].fillna(False).astype(bool)
+
+    age_known = lines["age"].notna()
+    gender_any = lines["gender_restriction"].fillna("ANY") == "ANY"
+    # True only where the policy says so; an unparseable flag stays unknown below
+    needs_preauth = lines["requires_preauth"].eq(True)
+    diagnosis_restricted = lines["diagnosis_restricted"].eq(True)
+    has_limit = lines["coverage_limit"].notna()
+
+    # failures, most fundamental first; the first one found becomes the reason
+    failures = [
+        (~lines["covered"], "Procedure {procedure_code} is not covered under policy {policy_id}."),
+        (lines["covered"] & diagnosis_restricted & ~lines["diagnosis_match"],
+         "No submitted diagnosis is covered for procedure {procedure_code} under policy {policy_id}."),
+        (age_known & ((lines["age"] < lines["age_min"]) | (lines["age"] > lines["age_max"])),
+         "Patient age {age:g} is outside the covered range for procedure {procedure_code}."),
+        (~gender_any & lines["gender"].notna() & (lines["gender"] != lines["gender_restriction"]),
+         "Procedure {procedure_code} is restricted to gender {gender_restriction}."),
+        (needs_preauth & (lines["preauth_obtained"] == False),  # noqa: E712 (None means unknown)
+         "Procedure {procedure_code} requires preauthorization, which was not obtained."),
+        (has_limit & (lines["billed_amount"] > lines["coverage_limit"]),
+         "Billed amount {billed_amount:g} exceeds the coverage limit {coverage_limit:g}."),
+    ]
+    # checks that need data the claim does not carry
+    unknown = lines["covered"] & (
+        (lines[["age_min", "age_max"]].notna().any(axis=1) & ~age_known)
+        | (~gender_any & lines["gender"].isna())
+        | (needs_preauth & lines["preauth_obtained"].isna())
+        | (lines["requires_preauth"].isna() & lines["preauth_obtained"].ne(True))
+        | (has_limit & lines["billed_amount"].isna())
+        | lines["unreadable"].eq(True)
+    )
+
+    failed = np.zeros(len(lines), dtype=bool)
+    reason = pd.Series([None] * len(lines), index=lines.index, dtype=object)
+    for mask, template in failures:
+        first = mask.fillna(False).values & ~failed
+        for i in np.flatnonzero(first):
+            reason.iat[i] = template.format(**lines.iloc[i].to_dict())
+        failed |= first
+    lines["failed"] = failed
+    lines["unknown"] = unknown.values & ~failed
+    lines["reason"] = reason
+
+    per_claim = lines.groupby("claim").agg(failed=("failed", "any"), unknown=("unknown", "any"))
+    first_reason = lines[lines["failed"]].groupby("claim")["reason"].first()
+
+    result = pd.DataFrame({"decision": None, "reason": None}, index=claims.index, dtype=object)
+    has_policy = claims["policy_id"].isin(policies.policy_ids)
+    no_policy = claims["policy_id"].notna() & ~has_policy
+    result.loc[no_policy, "decision"] = ROUTE_FOR_REVIEW
+    result.loc[no_policy, "reason"] = "Policy " + claims.loc[no_policy, "policy_id"].astype(str) + " was not found."
+
+    decided = per_claim.index[has_policy.loc[per_claim.index].values]
+    rejected = per_claim.loc[decided].index[per_claim.loc[decided, "failed"].values]
+    approved = per_claim.loc[decided].index[
+        (~per_claim.loc[decided, "failed"] & ~per_claim.loc[decided, "unknown"]).values]
+    result.loc[rejected, "decision"] = ROUTE_FOR_REVIEW
+    result.loc[rejected, "reason"] = first_reason.loc[rejected]
+    result.loc[approved, "decision"] = APPROVE
+    result.loc[approved, "reason"] = (
+        "All billed procedures are covered for the submitted diagnoses, and age, gender, "
+        "preauthorization and billed amount are within the policy limits.")
+    return result
+
+
+def format_decision(decision: str, reason: str) -> str:
+    """Render a rule decision in the same format check_claim_coverage asks the LLM for."""
+    return f"- Decision: {decision}\n- Reason: {reason}"
@@ -0,0 +1,131 @@
+"""
+Single-request structured coverage checks.
+
+Instead of the three-call chain (record summary, policy summary, coverage
+check), the raw records and just the parts of their policies they touch
+go out in one request, and the model answers with JSON matching
+COVERAGE_SCHEMA. Several claims can share a request: pack_claims() groups
+them while the estimated prompt stays within a token budget.
+"""
+
+import json
+from typing import Any, Dict, List
+
+from claims_data import code_text
+from claims_prompts import compact_json as _compact, count_message_tokens
+from claims_rules import APPROVE, PROCEDURE_FIELDS, RECORD_FIELDS, ROUTE_FOR_REVIEW, as_list, field
+
+COVERAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "claims": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "patient_id": {"type": "string"},
+                    "decision": {"type": "string", "enum": [APPROVE, ROUTE_FOR_REVIEW]},
+                    "reason": {"type": "string"},
+                    "matched_codes": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["patient_id", "decision", "reason", "matched_codes"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["claims"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "claim_coverage_decisions", "strict": True, "schema": COVERAGE_SCHEMA},
+}
+
+SYSTEM_PROMPT = "You are an insurance claim coverage validator. Answer with JSON only."
+
+INSTRUCTIONS = """Determine claim coverage eligibility for every claim below based on:
+1. Diagnosis and procedure match between the claim and its policy's covered procedures.
+2. Age, gender, and preauthorization compliance.
+3. Billed amount vs coverage limit.
+
+Each claim's policy is listed under its insurance policy ID, with only the covered procedures the claim bills.
+A billed procedure missing from its policy is not covered.
+Return one entry per claim with its patient_id, decision (APPROVE or ROUTE FOR REVIEW),
+a brief reason, and the ICD-10/CPT codes that matched the policy."""
+
+
+def policy_subset(policy: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """The policy with covered_procedures narrowed to the procedures the record bills."""
+    billed = set(as_list(field(record, RECORD_FIELDS["procedure_codes"])))
+    subset = {k: v for k, v in policy.items() if k != "covered_procedures"}
+    subset["covered_procedures"] = [
+        p for p in policy.get("covered_procedures", [])
+        if code_text(field(p, PROCEDURE_FIELDS["procedure_code"])) in billed
+    ]
+    return subset
+
+
+def build_messages(records: List[Dict[str, Any]], policy_index: Dict[str, Dict[str, Any]],
+                   reference_index) -> List[Dict[str, str]]:
+    """Chat messages asking for decisions on all `records` in one request."""
+    policies: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        policy_id = field(record, RECORD_FIELDS["policy_id"])
+        policy = policy_index.get(policy_id)
+        if policy is None:
+            continue
+        subset = policy_subset(policy, record)
+        if policy_id in policies:
+            # claims sharing a policy share one entry with the union of their procedures
+            seen = {_compact(p) for p in policies[policy_id]["covered_procedures"]}
+            policies[policy_id]["covered_procedures"].extend(
+                p for p in subset["covered_procedures"] if _compact(p) not in seen)
+        else:
+            policies[policy_id] = subset
+    references = reference_index.describe_document({"claims": records, "policies": policies})
+    prompt = (f"{INSTRUCTIONS}\n\nPolicies:\n{_compact(policies)}\n\n"
+              f"Reference Codes:\n{_compact(references)}\n\nClaims:\n{_compact(records)}")
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def pack_claims(records: List[Dict[str, Any]], policy_index: Dict[str, Dict[str, Any]], reference_index,
+                token_budget: int = 12000, max_claims: int = 10) -> List[List[Dict[str, Any]]]:
+    """
+    Group records into requests of at most `max_claims` whose prompts stay
+    under `token_budget` tokens (counted locally, see claims_prompts.count_tokens;
+    a claim too large on its own still gets a request).
+    Records are grouped by policy so shared policy text is sent once.
+    """
+    ordered = sorted(records, key=lambda r: str(field(r, RECORD_FIELDS["policy_id"])))
+    packs: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    for record in ordered:
+        candidate = current + [record]
+        size = count_message_tokens(build_messages(candidate, policy_index, reference_index))
+        if current and (len(candidate) > max_claims or size > token_budget):
+            packs.append(current)
+            candidate = [record]
+        current = candidate
+    if current:
+        packs.append(current)
+    return packs
+
+
+def parse_response(text: str) -> Dict[str, Dict[str, Any]]:
+    """Map patient_id -> {decision, reason, matched_codes} from a structured response."""
+    payload = json.loads(text)
+    results = {}
+    for claim in payload.get("claims", []):
+        decision = str(claim.get("decision", "")).strip().upper()
+        if decision not in (APPROVE, ROUTE_FOR_REVIEW):
+            raise ValueError(f"Unexpected decision {claim.get('decision')!r} for {claim.get('patient_id')}")
+        results[str(claim["patient_id"])] = {
+            "decision": decision,
+            "reason": str(claim.get("reason", "")).strip(),
+            "matched_codes": [str(c) for c in claim.get("matched_codes", [])],
+        }
+    return results
@@ -0,0 +1,196 @@
+"""
+Lightweight tracing for the claims agent.
+
+Tracer records two kinds of events from any number of threads:
+
+- spans: timed pipeline stages (a claim, a record summary, a coverage
+  check, ...), opened with `with tracer.span("stage"):` or by decorating
+  a function with `@tracer.traced("stage")`;
+- LLM calls: latency, rate-limit wait, retries, token usage and whether
+  the response cache answered, attributed to the innermost open span,
+  together with the locally counted prompt size.
+
+summary() aggregates them per stage (p50/p95 latency, tokens, cache hit
+rate, prompt-size distribution) plus run totals (throughput, tokens and cost per claim), and
+export() writes that summary to JSON or CSV.
+"""
+
+import csv
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+def _percentiles(seconds: List[float]) -> Dict[str, float]:
+    import numpy as np  # only needed when summarising; keeps `import claims_trace` light
+
+    if not seconds:
+        return {"p50_seconds": None, "p95_seconds": None, "mean_seconds": None, "total_seconds": 0.0}
+    values = np.asarray(seconds)
+    return {
+        "p50_seconds": round(float(np.percentile(values, 50)), 4),
+        "p95_seconds": round(float(np.percentile(values, 95)), 4),
+        "mean_seconds": round(float(values.mean()), 4),
+        "total_seconds": round(float(values.sum()), 4),
+    }
+
+
+def _token_distribution(tokens: List[int]) -> Dict[str, Any]:
+    import numpy as np
+
+    if not tokens:
+        return {"prompt_tokens_p50": None, "prompt_tokens_p95": None, "prompt_tokens_max": None}
+    values = np.asarray(tokens)
+    return {
+        "prompt_tokens_p50": int(np.percentile(values, 50)),
+        "prompt_tokens_p95": int(np.percentile(values, 95)),
+        "prompt_tokens_max": int(values.max()),
+    }
+
+
+class Tracer:
+    """Thread-safe collector of stage spans and LLM call records."""
+
+    def __init__(self, prompt_cost_per_1k: float = 0.0, completion_cost_per_1k: float = 0.0):
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.completion_cost_per_1k = completion_cost_per_1k
+        self.spans: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget recorded events and restart the run clock."""
+        with self._lock:
+            self.spans = []
+            self.calls = []
+            self.started = time.perf_counter()
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def stage(self) -> Optional[str]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, stage: str):
+        stack = self._stack()
+        stack.append(stage)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            event = {"stage": stage, "seconds": time.perf_counter() - start, "error": error}
+            with self._lock:
+                self.spans.append(event)
+
+    def traced(self, stage: str):
+        """Decorator running the wrapped function inside a span."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record_call(self, seconds: float, completion: Any = None, retries: int = 0, wait: float = 0.0,
+                    prompt_size: int = 0, trimmed: bool = False) -> None:
+        """
+        Record one LLM call; `completion` is None when the call failed. `prompt_size`
+        is the locally counted prompt, `trimmed` whether it was cut to a budget.
+        """
+        event = {
+            "stage": self.stage,
+            "seconds": seconds,
+            "wait_seconds": wait,
+            "retries": retries,
+            "error": completion is None,
+            "cached": bool(completion is not None and completion.cached),
+            "prompt_tokens": getattr(completion, "prompt_tokens", 0),
+            "completion_tokens": getattr(completion, "completion_tokens", 0),
+            "prompt_size": prompt_size,
+            "trimmed": trimmed,
+        }
+        with self._lock:
+            self.calls.append(event)
+
+    def summary(self, claims: Optional[int] = None) -> Dict[str, Any]:
+        """Per-stage latency and token statistics plus run totals."""
+        with self._lock:
+            spans, calls = list(self.spans), list(self.calls)
+        wall = time.perf_counter() - self.started
+
+        stages = []
+        for stage in dict.fromkeys(s["stage"] for s in spans):
+            selected = [s for s in spans if s["stage"] == stage]
+            stages.append(dict({"stage": stage, "count": len(selected),
+                                "errors": sum(s["error"] is not None for s in selected)},
+                               **_percentiles([s["seconds"] for s in selected])))
+
+        llm = []
+        for stage in dict.fromkeys(c["stage"] for c in calls):
+            selected = [c for c in calls if c["stage"] == stage]
+            sent = [c for c in selected if not c["cached"]]
+            llm.append(dict({
+                "stage": stage,
+                "calls": len(selected),
+                "cached": len(selected) - len(sent),
+                "errors": sum(c["error"] for c in selected),
+                "retries": sum(c["retries"] for c in selected),
+                "wait_seconds": round(sum(c["wait_seconds"] for c in selected), 4),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in sent),
+                "completion_tokens": sum(c["completion_tokens"] for c in sent),
+                "trimmed_prompts": sum(c["trimmed"] for c in selected),
+            }, **_percentiles([c["seconds"] for c in selected]),
+                **_token_distribution([c["prompt_size"] for c in selected if c["prompt_size"]])))
+
+        sent = [c for c in calls if not c["cached"]]
+        prompt_tokens = sum(c["prompt_tokens"] for c in sent)
+        completion_tokens = sum(c["completion_tokens"] for c in sent)
+        cost = (prompt_tokens * self.prompt_cost_per_1k + completion_tokens * self.completion_cost_per_1k) / 1000
+        run = {
+            "wall_seconds": round(wall, 4),
+            "claims": claims,
+            "claims_per_second": round(claims / wall, 4) if claims and wall else None,
+            "llm_calls": len(calls),
+            "cache_hits": len(calls) - len(sent),
+            "cache_hit_rate": round((len(calls) - len(sent)) / len(calls), 4) if calls else None,
+            "retries": sum(c["retries"] for c in calls),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_claim": round((prompt_tokens + completion_tokens) / claims, 1) if claims else None,
+            "estimated_cost": round(cost, 6),
+            "cost_per_claim": round(cost / claims, 6) if claims else None,
+        }
+        return {"run": run, "stages": stages, "llm": llm}
+
+    def export(self, path: str, claims: Optional[int] = None) -> Dict[str, Any]:
+        """Write summary() to `path`: JSON, or CSV (one row per stage) for a .csv path."""
+        summary = self.summary(claims)
+        if path.endswith(".csv"):
+            rows = ([dict(kind="run", **summary["run"])]
+                    + [dict(kind="stage", **s) for s in summary["stages"]]
+                    + [dict(kind="llm", **c) for c in summary["llm"]])
+            fields = list(dict.fromkeys(k for row in rows for k in row))
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+        return summary
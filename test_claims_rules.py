@@ -0,0 +1,70 @@
+"""Edge cases of the deterministic coverage rules (run with: python -m pytest -q test_claims_rules.py)."""
+
+from claims_rules import APPROVE, ROUTE_FOR_REVIEW, _age_bounds, _number, evaluate_claims, policy_tables
+
+
+def _policy(**procedure):
+    entry = {"procedure_code": "99213", "covered_diagnoses": ["E11.9"]}
+    entry.update(procedure)
+    return {"POL1": {"policy_id": "POL1", "covered_procedures": [entry]}}
+
+
+def _record(**fields):
+    record = {"patient_id": "P1", "insurance_policy_id": "POL1", "age": 30, "gender": "F",
+              "diagnosis_codes": ["E11.9"], "procedure_codes": ["99213"],
+              "preauthorization_obtained": True, "billed_amount": 100}
+    record.update(fields)
+    return record
+
+
+def _decide(record, policies):
+    return evaluate_claims([record], policies).iloc[0]
+
+
+def test_unparsed_age_range_and_limit_are_left_for_the_llm():
+    policies = _policy(age_range="65 and older", coverage_limit="about five thousand")
+    assert _decide(_record(billed_amount=90000), policies)["decision"] is None
+
+
+def test_plus_age_range_is_parsed():
+    assert _age_bounds({"age_range": "65+"}) == (65.0, None, True)
+    assert _age_bounds({"age_range": "18 to 64"}) == (18.0, 64.0, True)
+    rule = _decide(_record(age=30), _policy(age_range="65+"))
+    assert rule["decision"] == ROUTE_FOR_REVIEW
+    assert "age 30" in rule["reason"]
+    assert _decide(_record(age=70), _policy(age_range="65+"))["decision"] == APPROVE
+
+
+def test_currency_limits_are_parsed():
+    assert _number("$5,000") == 5000
+    assert _number("5000 USD") == 5000
+    rule = _decide(_record(billed_amount=90000), _policy(coverage_limit="$5,000"))
+    assert rule["decision"] == ROUTE_FOR_REVIEW
+    assert "exceeds the coverage limit 5000" in rule["reason"]
+    assert _decide(_record(billed_amount=4000), _policy(coverage_limit="5000 USD"))["decision"] == APPROVE
+
+
+def test_procedure_without_diagnosis_list_covers_any_diagnosis():
+    policies = _policy(covered_diagnoses=None)
+    assert _decide(_record(diagnosis_codes=["Z00.0"]), policies)["decision"] == APPROVE
+
+
+def test_unknown_preauthorization_is_left_for_the_llm():
+    policies = _policy(requires_preauthorization=True)
+    assert _decide(_record(preauthorization_obtained=None), policies)["decision"] is None
+    assert _decide(_record(preauthorization_obtained="maybe"), policies)["decision"] is None
+    assert _decide(_record(preauthorization_obtained=False), policies)["decision"] == ROUTE_FOR_REVIEW
+
+
+def test_numeric_codes_match_string_codes():
+    policies = _policy(procedure_code=99213)
+    assert _decide(_record(procedure_codes=[99213]), policies)["decision"] == APPROVE
+    assert _decide(_record(procedure_codes=["99214"]), policies)["decision"] == ROUTE_FOR_REVIEW
+
+
+def test_prebuilt_policy_tables_give_the_same_decisions():
+    policies = _policy(age_range="18-64", coverage_limit=500)
+    records = [_record(), _record(age=70), _record(insurance_policy_id="POL9")]
+    expected = evaluate_claims(records, policies)
+    assert evaluate_claims(records, policy_tables(policies)).equals(expected)
+    assert list(expected["decision"]) == [APPROVE, ROUTE_FOR_REVIEW, ROUTE_FOR_REVIEW]